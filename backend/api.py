@@ -1,17 +1,35 @@
+import time
 import uvicorn
-from fastapi import FastAPI, Query, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from typing import List, Optional
+from typing import Optional
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
-from mongodb import (
-    get_latest_categories, 
-    get_latest_streams, 
+from cache import ResponseCache, render_json, etag_matches
+from live import LiveBroadcaster, LIVE_CATEGORIES_LIMIT, LIVE_STREAMS_LIMIT
+from metrics import API_REQUEST_SECONDS
+from downsample import METHODS as DOWNSAMPLE_METHODS, downsample_series
+from export import SOURCES as EXPORT_SOURCES, FORMATS as EXPORT_FORMATS, build_query, stream_export, to_storage_time
+from mongodb_async import (
+    get_data_generation,
+    get_latest_categories,
+    get_latest_streams,
+    get_streams_page,
+    get_series,
+    get_trending,
+    get_tag_totals,
+    iter_latest_streams,
     get_categories_history,
     get_streams_history,
-    serialize_mongo_document
+    get_current_history_points,
+    get_dashboard,
+    get_statistics as fetch_statistics
 )
 
 # Configuration du logging
@@ -21,11 +39,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger("TwitchAPI")
 
+# Période maximale d'historique (servie par les agrégats journaliers au-delà de 7 jours)
+MAX_HISTORY_HOURS = 24 * 90
+
+async def load_live_snapshot():
+    """État courant diffusé aux clients en direct après chaque enregistrement."""
+    categories, streams = await asyncio.gather(
+        get_latest_categories(limit=LIVE_CATEGORIES_LIMIT),
+        get_latest_streams(limit=LIVE_STREAMS_LIMIT)
+    )
+    history_points = await get_current_history_points(channels=[row["channel"] for row in streams])
+    return categories, streams, history_points
+
+class RenderedJSONResponse(Response):
+    """Réponse JSON encodée par render_json, comme les réponses servies depuis le cache."""
+    media_type = "application/json"
+
+    def render(self, content):
+        return render_json(content)
+
+@asynccontextmanager
+async def lifespan(app):
+    live_broadcaster.start()
+    yield
+    await live_broadcaster.stop()
+
 # Création de l'application FastAPI
 app = FastAPI(
     title="API Twitch Scraper",
     description="API pour récupérer les données scrapées de Twitch",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RenderedJSONResponse
 )
 
 # Configuration CORS pour permettre les requêtes depuis le frontend
@@ -37,6 +82,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Mesure la latence de chaque requête, étiquetée par le modèle de route (et non l'URL)."""
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        API_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status
+        ).observe(time.perf_counter() - start_time)
+
+# Cache des réponses, invalidé à chaque enregistrement du scraper
+response_cache = ResponseCache(fetch_generation=get_data_generation)
+
+async def cached_response(request: Request, endpoint, params, loader):
+    """Sert une réponse depuis le cache de la génération courante, avec ETag / 304."""
+    generation = await response_cache.get_generation()
+    key = (endpoint, tuple(sorted(params.items())), generation)
+    etag = response_cache.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    async def render():
+        # La réponse est encodée une seule fois par génération
+        return render_json(await loader())
+    
+    body = await response_cache.get_or_load(key, render)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def format_history(history, key):
+    """Aplatit les points d'historique pour faciliter l'utilisation côté frontend."""
+    return [
+        {
+            key: point["_id"][key],
+            "hour": point["_id"]["hour"],
+            "day": point["_id"]["day"],
+            "month": point["_id"]["month"],
+            "avg_viewers": point["avg_viewers"],
+            "max_viewers": point["max_viewers"],
+            "min_viewers": point["min_viewers"],
+            "count": point["count"]
+        }
+        for point in history
+    ]
+
+# Diffusion en direct des diffs à chaque cycle de scraping
+live_broadcaster = LiveBroadcaster(
+    get_generation=response_cache.get_generation,
+    load_snapshot=load_live_snapshot,
+    format_history=format_history
+)
+
 # Modèles de données
 class Category(BaseModel):
     category: str
@@ -65,102 +170,259 @@ class HistoryPoint(BaseModel):
 async def root():
     return {"message": "Bienvenue sur l'API Twitch Scraper"}
 
-@app.get("/api/categories", response_model=List[dict])
-async def get_categories(limit: int = Query(20, ge=1, le=100)):
-    """Récupère les catégories les plus récentes par nombre de spectateurs."""
+@app.get("/api/categories")
+async def get_categories(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    tag: Optional[str] = None
+):
+    """Récupère les catégories les plus récentes par nombre de spectateurs (filtrables par tag)."""
+    async def load():
+        return await get_latest_categories(limit=limit, tag=tag)
+    
     try:
-        categories = get_latest_categories(limit=limit)
-        return serialize_mongo_document(categories)  # 🔥 Appliquer la conversion
+        return await cached_response(request, "categories", {"limit": limit, "tag": tag}, load)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des catégories: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/streams", response_model=List[dict])
+@app.get("/api/streams")
 async def get_streams(
+    request: Request,
     category: Optional[str] = None, 
-    limit: int = Query(50, ge=1, le=200)
+    limit: int = Query(50, ge=1, le=200),
+    tag: Optional[str] = None
 ):
-    """Récupère les streams les plus récents par nombre de spectateurs."""
+    """Récupère les streams les plus récents par nombre de spectateurs (filtrables par tag)."""
+    async def load():
+        return await get_latest_streams(category=category, limit=limit, tag=tag)
+    
     try:
-        streams = get_latest_streams(category=category, limit=limit)
-        return serialize_mongo_document(streams)  # 🔥 Convertir ObjectId en str
+        params = {"category": category, "limit": limit, "tag": tag}
+        return await cached_response(request, "streams", params, load)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des streams: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/categories/history", response_model=List[dict])
-async def get_history_categories(hours: int = Query(24, ge=1, le=168)):
+@app.get("/api/streams/page")
+async def get_streams_by_page(
+    category: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Parcourt l'état courant des streams page par page (curseur `next_cursor` de la page précédente)."""
+    try:
+        return await get_streams_page(category=category, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération d'une page de streams: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/streams/ndjson")
+async def stream_all_streams(category: Optional[str] = None):
+    """Tous les streams de l'état courant en NDJSON, une ligne par chaîne, lus au fil du curseur."""
+    async def lines():
+        try:
+            async for row in iter_latest_streams(category=category):
+                yield render_json(row) + b"\n"
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi des streams en NDJSON: {e}")
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/api/categories/history")
+async def get_history_categories(request: Request, hours: int = Query(24, ge=1, le=MAX_HISTORY_HOURS)):
     """Récupère l'historique des catégories sur une période donnée."""
+    async def load():
+        return format_history(await get_categories_history(hours=hours), "category")
+    
     try:
-        history = get_categories_history(hours=hours)
-        # Transformer les données pour faciliter l'utilisation côté frontend
-        formatted_history = []
-        for point in history:
-            formatted_history.append({
-                "category": point["_id"]["category"],
-                "hour": point["_id"]["hour"],
-                "day": point["_id"]["day"],
-                "month": point["_id"]["month"],
-                "avg_viewers": point["avg_viewers"],
-                "max_viewers": point["max_viewers"],
-                "min_viewers": point["min_viewers"],
-                "count": point["count"]
-            })
-        return formatted_history
+        return await cached_response(request, "categories_history", {"hours": hours}, load)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'historique des catégories: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/streams/history", response_model=List[dict])
+@app.get("/api/streams/history")
 async def get_history_streams(
+    request: Request,
     category: Optional[str] = None,
-    hours: int = Query(24, ge=1, le=168)
+    hours: int = Query(24, ge=1, le=MAX_HISTORY_HOURS)
 ):
     """Récupère l'historique des streams sur une période donnée."""
+    async def load():
+        return format_history(await get_streams_history(category=category, hours=hours), "channel")
+    
     try:
-        history = get_streams_history(category=category, hours=hours)
-        # Transformer les données pour faciliter l'utilisation côté frontend
-        formatted_history = []
-        for point in history:
-            formatted_history.append({
-                "channel": point["_id"]["channel"],
-                "hour": point["_id"]["hour"],
-                "day": point["_id"]["day"],
-                "month": point["_id"]["month"],
-                "avg_viewers": point["avg_viewers"],
-                "max_viewers": point["max_viewers"],
-                "min_viewers": point["min_viewers"],
-                "count": point["count"]
-            })
-        return formatted_history
+        return await cached_response(request, "streams_history", {"category": category, "hours": hours}, load)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'historique des streams: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/timeseries")
+async def get_timeseries(
+    request: Request,
+    category: Optional[str] = None,
+    channel: Optional[str] = None,
+    hours: int = Query(24, ge=1, le=MAX_HISTORY_HOURS),
+    points: int = Query(500, ge=10, le=5000),
+    method: str = Query("lttb", description="lttb ou minmax")
+):
+    """Série temporelle d'une catégorie ou d'une chaîne, réduite côté serveur à `points` points."""
+    if bool(category) == bool(channel):
+        raise HTTPException(status_code=400, detail="Indiquer une catégorie ou une chaîne")
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"Méthode inconnue: {method}")
+    
+    async def load():
+        source, times, viewers = await get_series(category=category, channel=channel, hours=hours)
+        # Calcul numpy hors de la boucle d'événements
+        series = await asyncio.to_thread(downsample_series, times, viewers, points, method)
+        return {
+            "category": category,
+            "channel": channel,
+            "source": source,
+            "method": method,
+            "total_points": len(times),
+            "points": series
+        }
+    
+    try:
+        params = {"category": category, "channel": channel, "hours": hours, "points": points, "method": method}
+        return await cached_response(request, "timeseries", params, load)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de la série temporelle: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/tags")
+async def get_tags(
+    request: Request,
+    kind: str = Query("streams", description="streams ou categories"),
+    category: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Spectateurs cumulés de l'état courant par tag, du plus regardé au moins regardé."""
+    if kind not in ("streams", "categories"):
+        raise HTTPException(status_code=400, detail=f"Type inconnu: {kind}")
+    
+    async def load():
+        return await get_tag_totals(kind=kind, category=category, limit=limit)
+    
+    try:
+        params = {"kind": kind, "category": category, "limit": limit}
+        return await cached_response(request, "tags", params, load)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des totaux par tag: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/trending/categories")
+async def get_rising_categories(request: Request, limit: int = Query(10, ge=1, le=50)):
+    """Catégories dont l'audience monte le plus vite par rapport à leur moyenne récente."""
+    async def load():
+        return await get_trending("categories", limit=limit)
+    
+    try:
+        return await cached_response(request, "trending_categories", {"limit": limit}, load)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des catégories en hausse: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/trending/streams")
+async def get_breakout_streams(request: Request, limit: int = Query(10, ge=1, le=50)):
+    """Streams en percée : audience très au-dessus de leur moyenne récente (z-score)."""
+    async def load():
+        return await get_trending("streams", limit=limit)
+    
+    try:
+        return await cached_response(request, "trending_streams", {"limit": limit}, load)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des streams en percée: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/statistics")
-async def get_statistics():
+async def get_statistics(request: Request):
     """Récupère des statistiques générales sur les données collectées."""
+    async def load():
+        # Catégories et streams les plus populaires, récupérés en parallèle
+        statistics = await fetch_statistics(limit=10)
+        statistics["last_update"] = datetime.now().isoformat()
+        return statistics
+    
     try:
-        # Obtenir les catégories les plus populaires
-        top_categories = get_latest_categories(limit=10)
-        
-        # Calculer les statistiques de base
-        total_viewers = sum(cat.get("viewers", 0) for cat in top_categories)
-        
-        # Obtenir les streams les plus populaires
-        top_streams = get_latest_streams(limit=10)
-        
-        return {
-            "top_categories": top_categories,
-            "top_streams": top_streams,
-            "total_viewers": total_viewers,
-            "last_update": datetime.now().isoformat()
-        }
+        return await cached_response(request, "statistics", {}, load)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des statistiques: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/dashboard")
+async def get_dashboard_data(
+    request: Request,
+    hours: int = Query(24, ge=1, le=MAX_HISTORY_HOURS),
+    categories_limit: int = Query(20, ge=1, le=100),
+    streams_limit: int = Query(50, ge=1, le=200)
+):
+    """Récupère en une réponse toutes les données du tableau de bord, issues d'un même cycle."""
+    async def load():
+        dashboard = await get_dashboard(
+            hours=hours, categories_limit=categories_limit, streams_limit=streams_limit
+        )
+        dashboard["categories_history"] = format_history(dashboard["categories_history"], "category")
+        dashboard["streams_history"] = format_history(dashboard["streams_history"], "channel")
+        dashboard["statistics"]["last_update"] = datetime.now().isoformat()
+        return dashboard
+    
+    try:
+        params = {"hours": hours, "categories_limit": categories_limit, "streams_limit": streams_limit}
+        return await cached_response(request, "dashboard", params, load)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération du tableau de bord: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/export")
+async def export_history(
+    source: str = Query("streams", description="categories, streams ou un agrégat (ex. streams_hourly)"),
+    format: str = Query("parquet", description="parquet ou arrow"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    category: Optional[str] = None,
+    channel: Optional[str] = None
+):
+    """Exporte l'historique d'une période quelconque en Parquet ou Arrow IPC, produit au fil de l'eau."""
+    if source not in EXPORT_SOURCES:
+        raise HTTPException(status_code=400, detail=f"Source inconnue: {source}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {format}")
+    
+    # Les dates avec fuseau (ex. « Z ») sont ramenées à l'heure locale des enregistrements
+    end = to_storage_time(end) or datetime.now()
+    start = to_storage_time(start) or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="La date de début doit précéder la date de fin")
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{source}_{start:%Y%m%d%H%M}_{end:%Y%m%d%H%M}.{extension}"
+    # Générateur synchrone (pymongo, pyarrow) : Starlette l'itère dans son pool de threads
+    return StreamingResponse(
+        stream_export(source, build_query(source, start, end, category, channel), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/live")
+async def live_updates():
+    """Flux SSE des changements poussés à chaque enregistrement du scraper."""
+    return StreamingResponse(
+        live_broadcaster.subscribe(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Métriques Prometheus de l'API (latences par route, opérations MongoDB)."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # Point d'entrée pour exécuter l'API
 if __name__ == "__main__":
     uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
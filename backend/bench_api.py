@@ -0,0 +1,296 @@
+"""Benchmark de l'API et des agrégations MongoDB sur des données synthétiques.
+
+Génère l'historique produit par save_categories_to_db / save_streams_to_db (cycles de
+scraping à intervalle fixe), puis mesure chaque endpoint de api.py à la concurrence
+demandée et écrit les résultats en JSON.
+
+Le mode --in-memory (mongomock, sans index réels) sert à valider le harnais sur de petits
+volumes ; les mesures de référence se font contre un mongod local.
+
+Exemples :
+    python bench_api.py --days 1,7,30 --channels 5000 --concurrency 16
+    python bench_api.py --in-memory --days 1 --interval 10
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+from synthetic import TAGS, synthetic_categories
+
+
+ENDPOINTS = [
+    "/api/categories",
+    "/api/streams",
+    "/api/streams?category=Category 0",
+    "/api/streams?tag=English",
+    "/api/tags",
+    "/api/streams/page?limit=100",
+    "/api/timeseries?category=Category 0&hours=24",
+    "/api/timeseries?channel=channel_0&hours=168&method=minmax",
+    "/api/trending/categories",
+    "/api/trending/streams",
+    "/api/statistics",
+    "/api/categories/history?hours=24",
+    "/api/streams/history?hours=24",
+    "/api/categories/history?hours=168",
+    "/api/categories/history?hours=720",
+    "/api/dashboard?hours=24",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de l'API Twitch Scraper")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default="twitch_bench", help="Base dédiée, vidée au démarrage")
+    parser.add_argument("--in-memory", action="store_true", help="Utiliser mongomock au lieu d'un mongod")
+    parser.add_argument("--days", default="1,7", help="Tailles d'historique à mesurer, en jours")
+    parser.add_argument("--interval", type=int, default=1, help="Minutes entre deux cycles de scraping")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=2000)
+    parser.add_argument("--streams-per-category", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="Requêtes par endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="Garder le cache de réponses actif")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_api_results.json")
+    return parser.parse_args()
+
+def install_in_memory_backend():
+    """Remplace les clients MongoDB par une base mongomock partagée (sync et async)."""
+    import pymongo
+    import mongomock
+    import mongomock_motor
+    import motor.motor_asyncio
+
+    shared_client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: shared_client
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(
+        mock_mongo_client=shared_client
+    )
+
+class SyntheticTwitch:
+    """Générateur de cycles de scraping réalistes (popularité en loi de puissance, cycle jour/nuit)."""
+
+    def __init__(self, categories, channels, streams_per_category, seed):
+        self.rng = random.Random(seed)
+        self.categories = synthetic_categories(categories, self.rng)
+        self.channels = {category["name"]: [] for category in self.categories}
+        for i in range(channels):
+            category = self.categories[min(int(self.rng.paretovariate(1.2)) - 1, categories - 1)]["name"]
+            self.channels[category].append({
+                "name": f"channel_{i}",
+                "viewers": int(50 * self.rng.paretovariate(1.1)),
+                "tag": self.rng.choice(TAGS)
+            })
+        self.streams_per_category = streams_per_category
+
+    def cycle(self, created_at):
+        """Documents d'un cycle, tels qu'enregistrés par save_categories_to_db / save_streams_to_db."""
+        timestamp = created_at.strftime("%Y-%m-%d %H:%M:%S")
+        daily_factor = 0.6 + 0.4 * (1 + math.sin(created_at.hour / 24 * 2 * math.pi)) / 2
+
+        categories_data = [
+            {
+                "timestamp": timestamp,
+                "category": category["name"],
+                "viewers": int(category["viewers"] * daily_factor * self.rng.uniform(0.9, 1.1)),
+                "tags": category["tags"],
+                "image_url": category["image_url"],
+                "created_at": created_at
+            }
+            for category in self.categories
+        ]
+
+        streams_data = []
+        for category, channels in self.channels.items():
+            live = [channel for channel in channels if self.rng.random() < 0.7]
+            live.sort(key=lambda channel: channel["viewers"], reverse=True)
+            for channel in live[:self.streams_per_category]:
+                streams_data.append({
+                    "timestamp": timestamp,
+                    "category": category,
+                    "title": f"{channel['name']} live !",
+                    "channel": channel["name"],
+                    "viewers": int(channel["viewers"] * daily_factor * self.rng.uniform(0.8, 1.2)),
+                    "tags": [channel["tag"]],
+                    "created_at": created_at
+                })
+
+        return categories_data, streams_data
+
+def load_history(mongodb, generator, start, end, interval, batch_rows=50000):
+    """Insère les cycles de [start, end) dans l'historique brut et les agrégats."""
+    counts = {"categories": 0, "streams": 0}
+    categories_batch, streams_batch = [], []
+
+    def flush():
+        for collection, rollups, keys, batch, name in (
+            (mongodb.categories_collection, mongodb.categories_rollups, ["category"], categories_batch, "categories"),
+            (mongodb.streams_collection, mongodb.streams_rollups, ["channel", "category"], streams_batch, "streams")
+        ):
+            if batch:
+                mongodb.tag_dictionary.encode_rows(batch)
+                collection.insert_many(batch, ordered=False)
+                mongodb.update_rollups(rollups, keys, batch)
+                counts[name] += len(batch)
+                batch.clear()
+
+    created_at = start
+    while created_at < end:
+        categories_data, streams_data = generator.cycle(created_at)
+        categories_batch.extend(categories_data)
+        streams_batch.extend(streams_data)
+        if len(categories_batch) + len(streams_batch) >= batch_rows:
+            flush()
+        created_at += timedelta(minutes=interval)
+    flush()
+    return counts
+
+def publish_trending(mongodb, now):
+    """Publie les classements des tendances à partir des derniers cycles chargés, comme le scraper."""
+    from trending import TrendingEngine, FOLLOW_LAG_SECONDS
+
+    engine = TrendingEngine(mongodb.trending_collection)
+    for kind, collection in (("categories", mongodb.categories_collection), ("streams", mongodb.streams_collection)):
+        engine.follow(kind, collection, now=now + timedelta(seconds=FOLLOW_LAG_SECONDS))
+
+def summarize(latencies, errors, elapsed):
+    """Percentiles (ms) et débit d'une série de mesures."""
+    if len(latencies) < 2:
+        return {"requests": len(latencies), "errors": errors}
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p95_ms": round(quantiles[94] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1)
+    }
+
+async def bench_endpoint(client, url, requests, concurrency):
+    """Envoie `requests` requêtes à `url` avec `concurrency` clients simultanés."""
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+async def bench_queries(mongodb_async, repeats):
+    """Coût des requêtes de la couche d'accès aux données, sans HTTP ni cache."""
+    queries = {
+        "get_latest_categories": lambda: mongodb_async.get_latest_categories(limit=20),
+        "get_latest_streams": lambda: mongodb_async.get_latest_streams(limit=50),
+        "get_categories_history_24h": lambda: mongodb_async.get_categories_history(hours=24),
+        "get_streams_history_24h": lambda: mongodb_async.get_streams_history(hours=24),
+        "get_categories_history_720h": lambda: mongodb_async.get_categories_history(hours=720),
+    }
+    results = {}
+    for name, query in queries.items():
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(repeats):
+            query_start = time.perf_counter()
+            await query()
+            latencies.append(time.perf_counter() - query_start)
+        results[name] = summarize(latencies, 0, time.perf_counter() - start)
+    return results
+
+async def run_benchmarks(args, api, mongodb_async):
+    import httpx
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        endpoints = {}
+        for url in ENDPOINTS:
+            endpoints[url] = await bench_endpoint(client, url, args.requests, args.concurrency)
+            print(f"  {url}: {endpoints[url]}")
+    queries = await bench_queries(mongodb_async, max(10, args.requests // 10))
+    return endpoints, queries
+
+async def main(args):
+    sizes = sorted(int(days) for days in args.days.split(","))
+
+    os.environ["MONGO_URI"] = args.uri
+    os.environ["MONGO_DB"] = args.db
+    if args.in_memory:
+        install_in_memory_backend()
+
+    # Partir d'une base vide avant que mongodb.py ne crée ses index
+    import pymongo
+    pymongo.MongoClient(args.uri).drop_database(args.db)
+
+    import mongodb
+    import mongodb_async
+    import api
+
+    if not args.cache:
+        # Mesurer le travail MongoDB : aucune réponse n'est conservée
+        api.response_cache.max_entries = 0
+        api.response_cache.generation_poll = 0
+
+    generator = SyntheticTwitch(args.categories, args.channels, args.streams_per_category, args.seed)
+    end = datetime.now().replace(second=0, microsecond=0)
+
+    # État courant et marqueur de génération, comme après un cycle du scraper
+    categories_data, streams_data = generator.cycle(end)
+    mongodb.tag_dictionary.encode_rows(categories_data + streams_data)
+    mongodb.update_latest(mongodb.latest_categories_collection, "category", categories_data)
+    mongodb.update_latest(mongodb.latest_streams_collection, "channel", streams_data)
+    mongodb.advance_data_generation()
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(),
+            "backend": "mongomock" if args.in_memory else args.uri,
+            "python": sys.version.split()[0],
+            **{key: value for key, value in vars(args).items() if key not in ("uri", "output")}
+        },
+        "runs": []
+    }
+
+    loaded_until = end + timedelta(minutes=args.interval)
+    totals = {"categories": 0, "streams": 0}
+    for days in sizes:
+        start = end - timedelta(days=days)
+        load_start = time.perf_counter()
+        counts = load_history(mongodb, generator, start, loaded_until, args.interval)
+        if loaded_until > end:
+            publish_trending(mongodb, loaded_until)
+        loaded_until = start
+        for name, count in counts.items():
+            totals[name] += count
+        print(f"{days} jour(s) d'historique : {totals} documents "
+              f"(chargés en {time.perf_counter() - load_start:.1f}s)")
+
+        endpoints, queries = await run_benchmarks(args, api, mongodb_async)
+        report["runs"].append({
+            "days": days,
+            "documents": dict(totals),
+            "endpoints": endpoints,
+            "queries": queries
+        })
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+    print(f"Résultats écrits dans {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,127 @@
+"""Benchmark hors ligne du scraper contre replay_server.py.
+
+Démarre le serveur de rejeu, pointe le scraper dessus (TWITCH_DIRECTORY_URL /
+TWITCH_CATEGORY_URL / TWITCH_GQL_URL) puis mesure la récupération des catégories et
+des streamers de bout en bout : durée de cycle, pages par seconde et lignes extraites.
+
+Exemples :
+    python bench_scraper.py --cycles 3 --workers 4
+    python bench_scraper.py --recordings recordings --load-delay 1.0 --scroll-delay 0.5
+    python bench_scraper.py --mode http --cycles 5
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+import psutil
+
+from replay_server import ReplayServer, LOAD_DELAY, SCROLL_DELAY, BATCH_SIZE
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark du scraper sur pages rejouées")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--mode", choices=["browser", "http"], default="browser", help="SCRAPER_FETCH_MODE")
+    parser.add_argument("--workers", type=int, default=4, help="Navigateurs parallèles (SCRAPER_WORKERS)")
+    parser.add_argument("--recordings", help="Pages enregistrées par `replay_server.py record`")
+    parser.add_argument("--load-delay", type=float, default=LOAD_DELAY)
+    parser.add_argument("--scroll-delay", type=float, default=SCROLL_DELAY)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default="twitch_replay_bench", help="Base recevant les lignes extraites")
+    parser.add_argument("--in-memory", action="store_true", help="Enregistrer dans mongomock")
+    parser.add_argument("--output", default="bench_scraper_results.json")
+    return parser.parse_args()
+
+def get_rss_mb():
+    """Mémoire résidente du benchmark et de ses processus enfants (navigateurs)."""
+    process = psutil.Process()
+    processes = [process] + process.children(recursive=True)
+    total = 0
+    for p in processes:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total // (1024 * 1024)
+
+def main():
+    args = parse_args()
+    server = ReplayServer(
+        recordings=args.recordings, load_delay=args.load_delay,
+        scroll_delay=args.scroll_delay, batch_size=args.batch_size
+    ).start()
+
+    # Configurer le scraper avant son import
+    os.environ["TWITCH_DIRECTORY_URL"] = server.directory_url
+    os.environ["TWITCH_CATEGORY_URL"] = server.category_url
+    os.environ["TWITCH_GQL_URL"] = server.gql_url
+    os.environ["SCRAPER_FETCH_MODE"] = args.mode
+    os.environ["SCRAPER_WORKERS"] = str(args.workers)
+    os.environ["MONGO_URI"] = args.uri
+    os.environ["MONGO_DB"] = args.db
+    if args.in_memory:
+        from bench_api import install_in_memory_backend
+        install_in_memory_backend()
+
+    import scraper
+
+    scrape_categories, scrape_streams = scraper.get_scrapers(args.mode)
+    warm_start = time.perf_counter()
+    if args.mode == "browser":
+        scraper.driver_pool.warm()
+    warmup_seconds = time.perf_counter() - warm_start
+
+    cycles = []
+    for cycle in range(args.cycles):
+        pages_before = server.pages_served
+
+        start = time.perf_counter()
+        categories = scrape_categories()
+        categories_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        streams = scrape_streams(categories)
+        streams_seconds = time.perf_counter() - start
+
+        cycle_seconds = categories_seconds + streams_seconds
+        pages = server.pages_served - pages_before
+        cycles.append({
+            "cycle": cycle + 1,
+            "cycle_seconds": round(cycle_seconds, 3),
+            "categories_seconds": round(categories_seconds, 3),
+            "streams_seconds": round(streams_seconds, 3),
+            "pages": pages,
+            "pages_per_second": round(pages / cycle_seconds, 2) if cycle_seconds else None,
+            "categories_rows": len(categories),
+            "streams_rows": sum(streams.values()),
+            "rss_mb": get_rss_mb()
+        })
+        print(cycles[-1])
+
+    scraper.writer.join()
+    scraper.driver_pool.close()
+    scraper.http_fetcher.close()
+    server.stop()
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(),
+            "pool_warmup_seconds": round(warmup_seconds, 3),
+            **{key: value for key, value in vars(args).items() if key not in ("uri", "output")}
+        },
+        "summary": {
+            "median_cycle_seconds": statistics.median(c["cycle_seconds"] for c in cycles),
+            "median_pages_per_second": statistics.median(c["pages_per_second"] or 0 for c in cycles),
+            "total_rows": sum(c["categories_rows"] + c["streams_rows"] for c in cycles)
+        },
+        "cycles": cycles
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+    print(f"Résultats écrits dans {args.output}")
+
+if __name__ == "__main__":
+    main()
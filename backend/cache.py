@@ -0,0 +1,104 @@
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+import orjson
+
+# Configuration du logging
+logger = logging.getLogger("ResponseCache")
+
+# Configuration du cache des réponses
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL_SECONDS = 600  # Filet de sécurité si la génération n'avance plus
+GENERATION_POLL_SECONDS = 2.0  # Fréquence maximale de lecture du marqueur de génération
+
+def render_json(value):
+    """Encode une réponse avec orjson (dates natives, ObjectId et autres types via str)."""
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+def etag_matches(header, etag):
+    """Vrai si l'en-tête If-None-Match désigne l'ETag (liste, validateurs faibles `W/`, `*`)."""
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+class ResponseCache:
+    """Cache LRU/TTL des réponses, invalidé par la génération de données du scraper."""
+
+    def __init__(self, fetch_generation, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS,
+                 generation_poll=GENERATION_POLL_SECONDS):
+        self.fetch_generation = fetch_generation
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation_poll = generation_poll
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._generation = None
+        self._generation_checked_at = 0.0
+        self._generation_lock = asyncio.Lock()
+
+    async def get_generation(self):
+        """Génération courante des données, relue au plus toutes les `generation_poll` secondes."""
+        if time.monotonic() - self._generation_checked_at < self.generation_poll:
+            return self._generation
+
+        async with self._generation_lock:
+            if time.monotonic() - self._generation_checked_at >= self.generation_poll:
+                try:
+                    self._generation = await self.fetch_generation()
+                except Exception as e:
+                    logger.error(f"Erreur lors de la lecture de la génération des données: {e}")
+                self._generation_checked_at = time.monotonic()
+        return self._generation
+
+    @staticmethod
+    def etag(key):
+        """ETag stable d'une clé de cache (endpoint, paramètres, génération)."""
+        return '"' + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20] + '"'
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key, loader):
+        """Retourne la valeur en cache ou la calcule une seule fois pour tous les appelants."""
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(loader())
+            self._pending[key] = pending
+            try:
+                # Une erreur du chargement est propagée à l'appelant et rien n'est conservé
+                value = await asyncio.shield(pending)
+                self._set(key, value)
+                return value
+            finally:
+                del self._pending[key]
+
+        return await asyncio.shield(pending)
@@ -0,0 +1,76 @@
+"""Sous-échantillonnage de séries temporelles préservant leur forme (LTTB, min/max).
+
+Les fonctions reçoivent des tableaux numpy triés par temps et retournent les indices
+des points conservés : le premier et le dernier point sont toujours gardés.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets : garde dans chaque seau le point formant le plus
+    grand triangle avec le point retenu précédent et la moyenne du seau suivant."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    # Seaux des points intérieurs ; le premier et le dernier point sont fixés
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Moyennes de tous les seaux calculées en une fois (le dernier point ferme la série)
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[n - 1])
+    avg_y = np.append(sums_y / counts, y[n - 1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Aires des triangles (précédent, candidat, moyenne du seau suivant), vectorisées par seau
+        areas = np.abs(
+            (x[previous] - avg_x[i + 1]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y[i + 1] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+def minmax(x, y, threshold):
+    """Garde le minimum et le maximum de chaque seau (threshold / 2 seaux), sans boucle Python."""
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    buckets = (threshold - 2) // 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(edges))
+    interior = np.arange(1, n - 1)
+    # Tri par (seau, valeur) : le premier point de chaque seau est son minimum, le dernier son maximum
+    order = interior[np.lexsort((y[1:n - 1], bucket_ids))]
+    firsts = edges[:-1] - 1
+    lasts = edges[1:] - 2
+    kept = np.concatenate(([0], order[firsts], order[lasts], [n - 1]))
+    return np.unique(kept)
+
+def downsample(x, y, threshold, method="lttb"):
+    """Indices des points à conserver selon la méthode demandée."""
+    if method == "minmax":
+        return minmax(x, y, threshold)
+    return lttb(x, y, threshold)
+
+def downsample_series(times, viewers, points, method="lttb"):
+    """Réduit une série (dates, spectateurs) à `points` points au plus, en lignes prêtes à servir."""
+    if not times:
+        return []
+    x = np.array(times, dtype="datetime64[ms]").astype(np.int64)
+    y = np.asarray(viewers, dtype=np.float64)
+    kept = downsample(x, y, points, method)
+    return [
+        {"timestamp": times[i].isoformat(), "viewers": int(round(y[i]))}
+        for i in kept.tolist()
+    ]
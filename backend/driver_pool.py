@@ -0,0 +1,226 @@
+import os
+import time
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from metrics import phase_timer
+
+# Configuration du logging
+logger = logging.getLogger("DriverPool")
+
+# Configuration du pool de navigateurs
+MAX_PAGES_PER_DRIVER = 50  # Recycler un navigateur après N pages
+MAX_DRIVER_RSS_MB = 1024  # Recycler un navigateur au-delà de ce seuil mémoire
+PAGE_LOAD_TIMEOUT = 30  # Secondes avant d'abandonner le chargement d'une page
+
+# Profil de scraping allégé : ressources inutiles à l'extraction bloquées
+LEAN_BROWSER = os.environ.get("SCRAPER_LEAN_BROWSER", "1") != "0"
+RENDERER_MAX_HEAP_MB = 512  # Tas JavaScript maximal d'un onglet
+BLOCKED_URL_PATTERNS = [
+    # Images et polices (l'URL des vignettes est lue dans l'attribut src, sans téléchargement)
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    # Aperçus vidéo en lecture automatique
+    "*.m3u8", "*.ts", "*.mp4", "*usher.ttvnw.net*", "*video-weaver*", "*video-edge*",
+    # Mesure d'audience et publicité
+    "*spade.twitch.tv*", "*countess.twitch.tv*", "*google-analytics.com*", "*googletagmanager.com*",
+    "*doubleclick.net*", "*amazon-adsystem.com*", "*scorecardresearch.com*",
+]
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def resolve_driver_path():
+    """Résout le binaire chromedriver une seule fois par processus."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            start_time = time.monotonic()
+            _driver_path = os.environ.get("CHROMEDRIVER_PATH") or ChromeDriverManager().install()
+            logger.info(f"Chromedriver résolu en {time.monotonic() - start_time:.1f}s: {_driver_path}")
+        return _driver_path
+
+def get_options(lean=LEAN_BROWSER):
+    """Options Chrome utilisées par tous les navigateurs du scraper."""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    
+    if lean:
+        # Pas de décodage d'images, de lecture automatique ni de composition GPU
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--autoplay-policy=user-gesture-required")
+        options.add_argument("--mute-audio")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-software-rasterizer")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--disable-component-update")
+        options.add_argument("--no-first-run")
+        # Mémoire des moteurs de rendu bornée
+        options.add_argument("--renderer-process-limit=2")
+        options.add_argument(f"--js-flags=--max-old-space-size={RENDERER_MAX_HEAP_MB}")
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2
+        })
+    return options
+
+def block_requests(driver, patterns=BLOCKED_URL_PATTERNS):
+    """Bloque les URL inutiles via le protocole DevTools (avant tout chargement de page)."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        logger.error(f"Erreur lors du blocage des requêtes: {e}")
+
+def get_driver():
+    """Démarre un nouveau navigateur Chrome headless."""
+    with phase_timer("driver_start"):
+        driver = webdriver.Chrome(service=Service(resolve_driver_path()), options=get_options())
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        if LEAN_BROWSER:
+            block_requests(driver)
+    return driver
+
+def get_driver_rss_mb(driver):
+    """Mémoire résidente (Mo) de chromedriver et de tous les processus Chrome associés."""
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) // (1024 * 1024)
+    except (psutil.Error, AttributeError):
+        return 0
+
+class PooledDriver:
+    """Navigateur du pool avec ses compteurs d'utilisation."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.monotonic()
+
+class DriverPool:
+    """Pool de navigateurs persistants réutilisés d'un cycle de scraping à l'autre."""
+
+    def __init__(self, size, max_pages=MAX_PAGES_PER_DRIVER, max_rss_mb=MAX_DRIVER_RSS_MB):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._idle = queue.LifoQueue()
+        self._busy = set()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def warm(self, count=None):
+        """Résout le driver et démarre les navigateurs à l'avance."""
+        resolve_driver_path()
+        count = self.size if count is None else min(count, self.size)
+        for _ in range(count - self._idle.qsize()):
+            pooled = self._create()
+            if pooled is None:
+                break
+            self._idle.put(pooled)
+        logger.info(f"Pool de navigateurs prêt: {self._idle.qsize()} sessions")
+
+    def _create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return PooledDriver(get_driver())
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _destroy(self, pooled):
+        with self._lock:
+            self._created -= 1
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def _is_healthy(self, pooled):
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _needs_recycling(self, pooled):
+        if pooled.pages >= self.max_pages:
+            logger.info(f"Recyclage d'un navigateur après {pooled.pages} pages")
+            return True
+        rss_mb = get_driver_rss_mb(pooled.driver)
+        if rss_mb > self.max_rss_mb:
+            logger.info(f"Recyclage d'un navigateur à {rss_mb} Mo")
+            return True
+        return False
+
+    def acquire(self, timeout=None):
+        """Emprunte un navigateur sain, en le créant si le pool n'est pas plein."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                pooled = self._create()
+                if pooled is None:
+                    pooled = self._idle.get(timeout=timeout)
+
+            if self._is_healthy(pooled):
+                break
+            logger.warning("Navigateur du pool hors service, remplacement")
+            self._destroy(pooled)
+
+        with self._lock:
+            self._busy.add(pooled)
+        return pooled
+
+    def release(self, pooled):
+        """Rend un navigateur au pool, ou le recycle s'il a trop servi."""
+        with self._lock:
+            self._busy.discard(pooled)
+        pooled.pages += 1
+        if self._needs_recycling(pooled):
+            self._destroy(pooled)
+        else:
+            self._idle.put(pooled)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Context manager : `with pool.driver() as driver: ...`."""
+        pooled = self.acquire(timeout=timeout)
+        try:
+            yield pooled.driver
+        finally:
+            self.release(pooled)
+
+    def kill_busy(self):
+        """Ferme les navigateurs en cours d'utilisation (sessions bloquées)."""
+        with self._lock:
+            busy = list(self._busy)
+        for pooled in busy:
+            try:
+                pooled.driver.quit()
+            except Exception:
+                pass
+
+    def close(self):
+        """Ferme tous les navigateurs inactifs du pool."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(pooled)
+        self.kill_busy()
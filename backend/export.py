@@ -0,0 +1,198 @@
+"""Export en colonnes (Parquet ou Arrow IPC) de l'historique brut ou agrégé.
+
+Les documents sont lus par lots depuis un curseur MongoDB trié par date et écrits
+au fil de l'eau (un groupe de lignes Parquet / un RecordBatch Arrow par lot) :
+la mémoire utilisée ne dépend pas de la période exportée.
+
+Exemples :
+    python export.py --source streams --start 2026-01-01 --end 2026-02-01 --out streams.parquet
+    python export.py --source categories_daily --format arrow --out categories_daily.arrow
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from mongodb import (
+    categories_collection,
+    streams_collection,
+    categories_rollups,
+    streams_rollups,
+    tag_dictionary,
+    split_tags
+)
+
+# Configuration du logging
+logger = logging.getLogger("Export")
+
+# Configuration de l'export
+EXPORT_BATCH_ROWS = 50000  # Lignes par lot lu et par groupe de lignes écrit
+PARQUET_COMPRESSION = "zstd"
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow")
+}
+
+ROLLUP_FIELDS = [
+    ("sum_viewers", pa.int64()),
+    ("count", pa.int64()),
+    ("max_viewers", pa.int64()),
+    ("min_viewers", pa.int64())
+]
+
+# Source exportable -> (collection, champ de date, schéma)
+SOURCES = {
+    "categories": (categories_collection, "created_at", pa.schema([
+        ("created_at", pa.timestamp("ms")),
+        ("category", pa.string()),
+        ("viewers", pa.int64()),
+        ("tags", pa.list_(pa.string())),
+        ("image_url", pa.string())
+    ])),
+    "streams": (streams_collection, "created_at", pa.schema([
+        ("created_at", pa.timestamp("ms")),
+        ("category", pa.string()),
+        ("channel", pa.string()),
+        ("title", pa.string()),
+        ("viewers", pa.int64()),
+        ("tags", pa.list_(pa.string()))
+    ])),
+    **{
+        f"categories_{tier}": (collection, "bucket", pa.schema(
+            [("bucket", pa.timestamp("ms")), ("category", pa.string())] + ROLLUP_FIELDS
+        ))
+        for tier, collection in categories_rollups.items()
+    },
+    **{
+        f"streams_{tier}": (collection, "bucket", pa.schema(
+            [("bucket", pa.timestamp("ms")), ("channel", pa.string()), ("category", pa.string())] + ROLLUP_FIELDS
+        ))
+        for tier, collection in streams_rollups.items()
+    }
+}
+
+class ChunkSink:
+    """Fichier en écriture seule dont les octets sont récupérés au fur et à mesure."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def to_storage_time(date):
+    """Date naïve en heure locale, comme les dates enregistrées (`datetime.now()`)."""
+    if date is not None and date.tzinfo is not None:
+        return date.astimezone().replace(tzinfo=None)
+    return date
+
+def build_query(source, start, end, category=None, channel=None):
+    """Filtre MongoDB d'un export : période [start, end) et clés optionnelles."""
+    _, time_field, schema = SOURCES[source]
+    query = {time_field: {"$gte": start, "$lt": end}}
+    if category:
+        query["category"] = category
+    if channel and "channel" in schema.names:
+        query["channel"] = channel
+    return query
+
+def iter_record_batches(source, query, batch_rows=EXPORT_BATCH_ROWS):
+    """Lit la source par lots triés par date et les convertit en RecordBatch Arrow."""
+    collection, time_field, schema = SOURCES[source]
+    projection = {"_id": 0, **{name: 1 for name in schema.names}}
+    has_tags = "tags" in schema.names
+    if has_tags:
+        projection["tag_ids"] = 1
+    cursor = collection.find(query, projection).sort(time_field, 1).batch_size(batch_rows)
+
+    columns = {name: [] for name in schema.names}
+    rows = 0
+    for doc in cursor:
+        if has_tags:
+            # Noms des tags, depuis le dictionnaire ou l'ancienne chaîne
+            doc["tags"] = tag_dictionary.decode(doc["tag_ids"]) if "tag_ids" in doc else split_tags(doc.get("tags"))
+        for name, values in columns.items():
+            values.append(doc.get(name))
+        rows += 1
+        if rows >= batch_rows:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {name: [] for name in schema.names}
+            rows = 0
+    if rows:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+def open_writer(sink, schema, export_format):
+    if export_format == "parquet":
+        return pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+    return pa.ipc.new_stream(sink, schema)
+
+def stream_export(source, query, export_format="parquet", batch_rows=EXPORT_BATCH_ROWS):
+    """Générateur des octets du fichier exporté, produit lot par lot."""
+    schema = SOURCES[source][2]
+    sink = ChunkSink()
+    writer = open_writer(sink, schema, export_format)
+    rows = 0
+    try:
+        for batch in iter_record_batches(source, query, batch_rows):
+            # Parquet : un groupe de lignes par lot, écrit puis libéré
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+    logger.info(f"Export {source} ({export_format}) terminé : {rows} lignes")
+
+def export_to_file(path, source, query, export_format="parquet", batch_rows=EXPORT_BATCH_ROWS):
+    """Écrit l'export dans un fichier local."""
+    with open(path, "wb") as output:
+        for data in stream_export(source, query, export_format, batch_rows):
+            output.write(data)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export Parquet / Arrow de l'historique Twitch")
+    parser.add_argument("--source", choices=sorted(SOURCES), default="streams")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Début (ISO), par défaut il y a 24h")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Fin exclue (ISO), par défaut maintenant")
+    parser.add_argument("--category")
+    parser.add_argument("--channel")
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS)
+    parser.add_argument("--out", help="Fichier de sortie, par défaut <source>.<format>")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    end = to_storage_time(args.end) or datetime.now()
+    start = to_storage_time(args.start) or end - timedelta(hours=24)
+    out = args.out or f"{args.source}.{FORMATS[args.format][1]}"
+
+    query = build_query(args.source, start, end, args.category, args.channel)
+    export_to_file(out, args.source, query, args.format, args.batch_rows)
+    print(f"Export écrit dans {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import logging
+from datetime import datetime
+
+# Configuration du logging
+logger = logging.getLogger("Extraction")
+
+# Sélecteurs CSS équivalents aux XPath historiques du scraper
+CATEGORY_CARD_SELECTOR = 'div[class*="game-card"]'
+STREAM_TITLE_SELECTOR = 'h3[class*="CoreText"]'
+STREAM_CHANNEL_SELECTOR = 'div[class*="Layout-sc-1xcs6mc-0 bQImNn"]'
+STREAM_VIEWERS_SELECTOR = 'div[class*="ScMediaCardStatWrapper"]'
+STREAM_TAG_SELECTOR = 'button[class*="ScTag"]'
+
+# Lit tous les champs des cartes de catégories en un seul aller-retour WebDriver
+CATEGORIES_JS = """
+const text = (el) => el ? (el.innerText || '').trim() : '';
+return Array.from(document.querySelectorAll(arguments[0])).map((card) => {
+    const img = card.querySelector('img');
+    return [
+        text(card.querySelector('h2')),
+        text(card.querySelector('p')),
+        Array.from(card.querySelectorAll('button[class*="tw-tag"] span')).map(text).filter(Boolean),
+        img ? img.getAttribute('src') : null
+    ];
+});
+"""
+
+# Lit les quatre listes de la page d'une catégorie en un seul aller-retour WebDriver
+STREAMS_JS = """
+const texts = (selector) => Array.from(document.querySelectorAll(selector))
+    .map((el) => (el.innerText || '').trim())
+    .filter(Boolean);
+return [texts(arguments[0]), texts(arguments[1]), texts(arguments[2]), texts(arguments[3])];
+"""
+
+def convert_viewers_count(viewers_text):
+    """Convertit le nombre de spectateurs du format Twitch en entier."""
+    if not viewers_text:
+        return 0
+        
+    viewers_text = viewers_text.replace(" viewers", "").replace(",", "").strip()
+    
+    if "K" in viewers_text:
+        return int(float(viewers_text.replace("K", "")) * 1000)
+    
+    if "." in viewers_text:
+        return int(float(viewers_text) * 1000)
+    
+    return int(viewers_text) if viewers_text.isdigit() else 0
+
+def extract_categories(driver):
+    """Extrait les catégories de la page courante sous forme de lignes structurées."""
+    cards = driver.execute_script(CATEGORIES_JS, CATEGORY_CARD_SELECTOR)
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    categories_data = []
+    for name, viewers_text, tags, image_url in cards:
+        category_name = name or "Unknown"
+        try:
+            viewers_count = convert_viewers_count(viewers_text)
+        except ValueError as e:
+            logger.error(f"Erreur lors du scraping de la catégorie {category_name}: {e}")
+            continue
+
+        if category_name != "Unknown" and viewers_count > 0:
+            categories_data.append({
+                "timestamp": timestamp,
+                "category": category_name,
+                "viewers": viewers_count,
+                "tags": tags or [],
+                "image_url": image_url or "No Image"
+            })
+
+    return categories_data
+
+def extract_streams(driver, category):
+    """Extrait les streamers de la page courante d'une catégorie."""
+    titles, channels, viewers, tags = driver.execute_script(
+        STREAMS_JS,
+        STREAM_TITLE_SELECTOR,
+        STREAM_CHANNEL_SELECTOR,
+        STREAM_VIEWERS_SELECTOR,
+        STREAM_TAG_SELECTOR
+    )
+    viewers_counts = [convert_viewers_count(v) for v in viewers]
+
+    # Assurer la longueur minimale
+    min_length = min(len(titles), len(channels), len(viewers_counts))
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    return [
+        {
+            "timestamp": timestamp,
+            "category": category,
+            "title": titles[i],
+            "channel": channels[i],
+            "viewers": viewers_counts[i],
+            "tags": [tags[i]] if i < len(tags) else []
+        }
+        for i in range(min_length)
+    ]
@@ -0,0 +1,191 @@
+"""Récupération sans navigateur des catégories et des streams via l'API GQL de Twitch.
+
+Les lignes produites ont la même forme que celles d'extraction.py, attendue par
+save_categories_to_db / save_streams_to_db. L'URL de l'API est configurable
+(TWITCH_GQL_URL) pour pointer vers le stand-in de replay_server.py.
+"""
+import os
+import asyncio
+import logging
+import threading
+from datetime import datetime
+
+import httpx
+
+# Configuration du logging
+logger = logging.getLogger("HttpFetcher")
+
+# Configuration de l'API GQL
+GQL_URL = os.environ.get("TWITCH_GQL_URL", "https://gql.twitch.tv/gql")
+CLIENT_ID = os.environ.get("TWITCH_CLIENT_ID", "kimne78kx3ncx6brgo4mv6wki5h1ko")  # Client web public
+HTTP_CONCURRENCY = int(os.environ.get("SCRAPER_HTTP_CONCURRENCY", 8))  # Requêtes simultanées
+HTTP_RATE_LIMIT = float(os.environ.get("SCRAPER_HTTP_RATE", 20))  # Requêtes par seconde
+HTTP_TIMEOUT = 10
+HTTP_RETRIES = 2  # Nouvelles tentatives sur 429 / 5xx / erreur réseau
+CATEGORIES_FIRST = 100
+STREAMS_FIRST = 100
+
+CATEGORIES_QUERY = """
+query DirectoryGames($first: Int!) {
+  games(first: $first, options: {sort: VIEWER_COUNT}) {
+    edges { node { displayName viewersCount boxArtURL(width: 188, height: 250) tags(tagType: CONTENT) { localizedName } } }
+  }
+}
+"""
+
+STREAMS_QUERY = """
+query GameStreams($name: String!, $first: Int!) {
+  game(name: $name) {
+    streams(first: $first, options: {sort: VIEWER_COUNT}) {
+      edges { node { title viewersCount broadcaster { displayName } freeformTags { name } } }
+    }
+  }
+}
+"""
+
+class RateLimiter:
+    """Espace les requêtes d'au moins 1/rate seconde (partagé par toutes les tâches)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = None
+
+    async def wait(self):
+        if not self.interval:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def category_row(node, timestamp):
+    tags = [tag["localizedName"] for tag in node.get("tags") or [] if tag.get("localizedName")]
+    return {
+        "timestamp": timestamp,
+        "category": node["displayName"],
+        "viewers": node.get("viewersCount") or 0,
+        "tags": tags,
+        "image_url": node.get("boxArtURL") or "No Image"
+    }
+
+def stream_row(node, category, timestamp):
+    tags = [tag["name"] for tag in node.get("freeformTags") or [] if tag.get("name")]
+    return {
+        "timestamp": timestamp,
+        "category": category,
+        "title": node.get("title") or "",
+        "channel": node["broadcaster"]["displayName"],
+        "viewers": node.get("viewersCount") or 0,
+        "tags": tags
+    }
+
+class HttpFetcher:
+    """Client GQL asynchrone à connexions persistantes, concurrence bornée et débit limité.
+
+    La boucle d'événements et le client sont conservés d'un cycle à l'autre pour
+    réutiliser les connexions keep-alive ; les méthodes `fetch_*` sont synchrones et
+    peuvent être appelées depuis plusieurs threads (coordinateur et workers d'un même
+    processus) : les appels s'exécutent alors l'un après l'autre sur la boucle.
+    """
+
+    def __init__(self, url=GQL_URL, client_id=CLIENT_ID, concurrency=HTTP_CONCURRENCY, rate=HTTP_RATE_LIMIT):
+        self.url = url
+        self.client_id = client_id
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate)
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._lock = threading.Lock()  # Une seule exécution de la boucle à la fois
+
+    def _run(self, coroutine):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(coroutine)
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Client-Id": self.client_id},
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def query(self, operation, query, variables):
+        """Exécute une requête GQL et retourne son champ `data`."""
+        client = self._get_client()
+        payload = {"operationName": operation, "query": query, "variables": variables}
+        for attempt in range(HTTP_RETRIES + 1):
+            async with self._semaphore:
+                await self.rate_limiter.wait()
+                try:
+                    response = await client.post(self.url, json=payload)
+                except httpx.TransportError as e:
+                    if attempt == HTTP_RETRIES:
+                        raise
+                    logger.warning(f"Erreur réseau sur {operation} ({e}), nouvelle tentative")
+                    continue
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == HTTP_RETRIES:
+                    response.raise_for_status()
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+            response.raise_for_status()
+            body = response.json()
+            if body.get("errors"):
+                raise RuntimeError(f"Erreur GQL sur {operation}: {body['errors']}")
+            return body["data"]
+
+    async def _fetch_categories(self, first):
+        data = await self.query("DirectoryGames", CATEGORIES_QUERY, {"first": first})
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [category_row(edge["node"], timestamp) for edge in data["games"]["edges"]]
+        return [row for row in rows if row["viewers"] > 0]
+
+    async def _fetch_streams(self, category, first):
+        data = await self.query("GameStreams", STREAMS_QUERY, {"name": category, "first": first})
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        game = data.get("game")
+        if not game:
+            return []
+        return [stream_row(edge["node"], category, timestamp) for edge in game["streams"]["edges"]]
+
+    async def _fetch_all_streams(self, categories, first):
+        results = await asyncio.gather(
+            *(self._fetch_streams(category, first) for category in categories),
+            return_exceptions=True
+        )
+        streams = {}
+        for category, result in zip(categories, results):
+            if isinstance(result, Exception):
+                # Une catégorie en échec n'interrompt pas les autres
+                logger.error(f"Erreur lors de la récupération de {category}: {result}")
+            else:
+                streams[category] = result
+        return streams
+
+    def fetch_categories(self, first=CATEGORIES_FIRST):
+        """Catégories du répertoire, triées par spectateurs."""
+        return self._run(self._fetch_categories(first))
+
+    def fetch_streams(self, categories, first=STREAMS_FIRST):
+        """Streams de chaque catégorie, récupérés en parallèle : {catégorie: lignes}."""
+        return self._run(self._fetch_all_streams(categories, first))
+
+    def close(self):
+        if self._client is not None:
+            self._run(self._client.aclose())
+            self._client = None
+        with self._lock:
+            if self._loop is not None:
+                self._loop.close()
+                self._loop = None
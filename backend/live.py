@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from cache import render_json
+
+# Configuration du logging
+logger = logging.getLogger("LiveUpdates")
+
+# Configuration des mises à jour en direct
+LIVE_POLL_SECONDS = 2.0  # Fréquence de détection d'un nouvel enregistrement du scraper
+LIVE_KEEPALIVE_SECONDS = 15.0  # Commentaire SSE envoyé pour garder les connexions ouvertes
+LIVE_QUEUE_SIZE = 16  # Messages en attente au-delà desquels un client lent est déconnecté
+LIVE_CATEGORIES_LIMIT = 100
+LIVE_STREAMS_LIMIT = 200
+LIVE_TOP_LIMIT = 10  # Lignes retenues pour les statistiques, comme /api/statistics
+
+# Champs transmis pour chaque ligne modifiée
+CATEGORY_FIELDS = ("category", "viewers", "tags", "image_url")
+STREAM_FIELDS = ("channel", "category", "title", "viewers", "tags")
+
+def diff_rows(previous, current, fields):
+    """Lignes nouvelles ou modifiées et clés disparues entre deux états."""
+    changed = []
+    for row_key, row in current.items():
+        compact = {field: row.get(field) for field in fields}
+        if previous.get(row_key) != compact:
+            changed.append(compact)
+    removed = [row_key for row_key in previous if row_key not in current]
+    return changed, removed
+
+def build_statistics(categories, streams, limit=LIVE_TOP_LIMIT):
+    """Statistiques du tableau de bord à partir des lignes triées par spectateurs."""
+    top_categories = categories[:limit]
+    return {
+        "top_categories": top_categories,
+        "top_streams": streams[:limit],
+        "total_viewers": sum(cat.get("viewers", 0) for cat in top_categories),
+        "last_update": datetime.now().isoformat()
+    }
+
+def encode_event(event, payload):
+    """Encode un message SSE une seule fois pour tous les abonnés."""
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + render_json(payload) + b"\n\n"
+
+class LiveBroadcaster:
+    """Diffuse à tous les clients SSE le diff produit par chaque enregistrement du scraper."""
+
+    def __init__(self, get_generation, load_snapshot, format_history):
+        self.get_generation = get_generation
+        self.load_snapshot = load_snapshot
+        self.format_history = format_history
+        self._subscribers = set()
+        self._generation = None
+        self._categories = {}
+        self._streams = {}
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                generation = await self.get_generation()
+                if generation != self._generation:
+                    await self._publish(generation)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur lors de la diffusion des mises à jour: {e}")
+            await asyncio.sleep(LIVE_POLL_SECONDS)
+
+    async def _publish(self, generation):
+        categories, streams, (category_points, stream_points) = await self.load_snapshot()
+        statistics = build_statistics(categories, streams)
+        categories = {row["category"]: row for row in categories}
+        streams = {row["channel"]: row for row in streams}
+
+        changed_categories, removed_categories = diff_rows(
+            self._categories, categories, CATEGORY_FIELDS
+        )
+        changed_streams, removed_streams = diff_rows(self._streams, streams, STREAM_FIELDS)
+
+        # Premier passage : on initialise l'état sans rien diffuser
+        first_run = self._generation is None
+        self._generation = generation
+        self._categories = {k: {f: row.get(f) for f in CATEGORY_FIELDS} for k, row in categories.items()}
+        self._streams = {k: {f: row.get(f) for f in STREAM_FIELDS} for k, row in streams.items()}
+        if first_run or not self._subscribers:
+            return
+
+        message = encode_event("update", {
+            "generation": generation,
+            "categories": {"changed": changed_categories, "removed": removed_categories},
+            "streams": {"changed": changed_streams, "removed": removed_streams},
+            "categories_history": self.format_history(category_points, "category"),
+            "streams_history": self.format_history(stream_points, "channel"),
+            "statistics": statistics
+        })
+        self.broadcast(message)
+        logger.info(f"Génération {generation} diffusée à {len(self._subscribers)} clients "
+                    f"({len(message)} octets)")
+
+    def broadcast(self, message):
+        """Envoie le même message encodé à chaque abonné, en écartant les clients trop lents."""
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.put_nowait(message)
+            except asyncio.QueueFull:
+                # Le client sera déconnecté à la lecture de son prochain message
+                self._subscribers.discard(subscriber)
+
+    async def subscribe(self):
+        """Générateur SSE d'un client : message de bienvenue, diffs, puis keepalives."""
+        subscriber = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        try:
+            yield encode_event("hello", {"generation": self._generation})
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None or subscriber not in self._subscribers:
+                    return
+                yield message
+        finally:
+            self._subscribers.discard(subscriber)
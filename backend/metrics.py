@@ -0,0 +1,109 @@
+import sys
+import time
+import threading
+import logging
+from collections import Counter
+
+from prometheus_client import Histogram, Gauge, Counter as PromCounter
+
+# Configuration du logging
+logger = logging.getLogger("Metrics")
+
+# Métriques du scraper
+SCRAPER_CYCLE_SECONDS = Histogram(
+    "scraper_cycle_seconds", "Durée d'un cycle complet de scraping",
+    buckets=(10, 30, 60, 120, 180, 300, 600, 900)
+)
+SCRAPER_PHASE_SECONDS = Histogram(
+    "scraper_phase_seconds", "Durée des phases du scraper",
+    ["phase"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+CATEGORY_SCRAPE_SECONDS = Histogram(
+    "scraper_category_seconds", "Durée du scraping des streamers d'une catégorie",
+    ["category"],
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+CATEGORY_ROWS = Gauge(
+    "scraper_category_rows", "Lignes extraites lors du dernier scraping d'une catégorie",
+    ["category"]
+)
+SCRAPER_ERRORS = PromCounter("scraper_errors_total", "Erreurs du scraper", ["phase"])
+
+# Métriques de l'écriture différée
+WRITER_QUEUE_DEPTH = Gauge("writer_queue_batches", "Lots en attente d'écriture dans MongoDB")
+WRITER_SPOOLED_ROWS = PromCounter("writer_spooled_rows_total", "Lignes écrites dans le spool disque", ["kind"])
+WRITER_REPLAYED_ROWS = PromCounter("writer_replayed_rows_total", "Lignes du spool rejouées dans MongoDB", ["kind"])
+WRITER_DEAD_LETTER_ROWS = PromCounter("writer_dead_letter_rows_total", "Lignes refusées par MongoDB, mises de côté", ["kind"])
+
+# Métriques MongoDB (insertions et agrégations)
+MONGO_OPERATION_SECONDS = Histogram(
+    "mongo_operation_seconds", "Latence des opérations MongoDB",
+    ["operation", "collection"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+# Métriques de l'API
+API_REQUEST_SECONDS = Histogram(
+    "api_request_seconds", "Latence des requêtes HTTP par route",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+def mongo_timer(operation, collection):
+    """Context manager mesurant une opération MongoDB : `with mongo_timer("aggregate", "streams"):`."""
+    return MONGO_OPERATION_SECONDS.labels(operation=operation, collection=collection).time()
+
+def phase_timer(phase):
+    """Context manager mesurant une phase du scraper."""
+    return SCRAPER_PHASE_SECONDS.labels(phase=phase).time()
+
+class SamplingProfiler:
+    """Profileur par échantillonnage : relève périodiquement la pile de chaque thread.
+
+    Le résultat est écrit au format « collapsed stacks » (une pile par ligne suivie de son
+    nombre d'échantillons), lisible par flamegraph.pl ou speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as output:
+            for stack, count in self.samples.most_common():
+                output.write(f"{stack} {count}\n")
+        logger.info(f"Profil écrit dans {path} ({sum(self.samples.values())} échantillons)")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
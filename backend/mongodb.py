@@ -1,20 +1,26 @@
+import os
+import json
+import base64
+import binascii
+import threading
 import pymongo
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
 from bson import ObjectId
 
-def serialize_mongo_document(document):
-    """Convertit un document MongoDB en dictionnaire sérialisable par FastAPI."""
-    if isinstance(document, list):
-        return [serialize_mongo_document(doc) for doc in document]
-    
-    if isinstance(document, dict):
-        document = document.copy()  # Éviter de modifier l'original
-        if "_id" in document and isinstance(document["_id"], ObjectId):
-            document["_id"] = str(document["_id"])  # Convertir ObjectId en string
-        return document
+from metrics import mongo_timer
 
+def serialize_mongo_document(document):
+    """Convertit en place (sans copie) les ObjectId et dates d'un document ou d'une liste de documents."""
+    documents = document if isinstance(document, list) else [document]
+    for doc in documents:
+        if isinstance(doc, dict):
+            for key, value in doc.items():
+                if isinstance(value, ObjectId):
+                    doc[key] = str(value)  # Convertir ObjectId en string
+                elif isinstance(value, datetime):
+                    doc[key] = value.isoformat()
     return document
 
 
@@ -22,10 +28,44 @@ def serialize_mongo_document(document):
 logger = logging.getLogger("MongoDB")
 
 # Configuration de la connexion MongoDB
-MONGO_URI = "mongodb://localhost:27017/"
-DB_NAME = "twitch_data"
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.environ.get("MONGO_DB", "twitch_data")
 CATEGORIES_COLLECTION = "categories"
 STREAMS_COLLECTION = "streams"
+LATEST_CATEGORIES_COLLECTION = "latest_categories"
+LATEST_STREAMS_COLLECTION = "latest_streams"
+META_COLLECTION = "meta"
+TRENDING_COLLECTION = "trending"
+TASKS_COLLECTION = "scrape_tasks"
+TAGS_COLLECTION = "tags"
+DATA_GENERATION_ID = "data_generation"
+TAG_COUNTER_ID = "tag_counter"  # Dernier identifiant de tag attribué
+TAGS_MIGRATION_ID = "tags_migration"  # Conversion des anciennes lignes terminée
+NO_TAGS = "No Tags"  # Forme texte d'une ligne sans tag
+TAGS_MIGRATION_BATCH = 1000
+ID_TYPES = ("objectId", "string")  # Types d'`_id` de l'historique (lignes du scraper, des workers)
+DUPLICATE_KEY_ERROR = 11000  # Code MongoDB des insertions en double
+# Erreurs de connexion (dont AutoReconnect, ServerSelectionTimeoutError) : MongoDB indisponible,
+# l'enregistrement pourra être rejoué ; elles sont propagées au lieu d'être journalisées
+TRANSIENT_ERRORS = (pymongo.errors.ConnectionFailure,)
+
+# Champs renvoyés par l'API pour l'état courant
+# (`tag_ids` est remplacé par la forme texte `tags` à la lecture)
+LATEST_CATEGORY_PROJECTION = {"_id": 0, "category": 1, "viewers": 1, "tag_ids": 1, "tags": 1, "image_url": 1, "timestamp": 1}
+LATEST_STREAM_PROJECTION = {"_id": 0, "channel": 1, "category": 1, "title": 1, "viewers": 1, "tag_ids": 1, "tags": 1, "timestamp": 1}
+ROLLUP_PROJECTION = {"_id": 0}
+
+# Ordre total des pages de streams (clé de pagination : spectateurs puis chaîne)
+STREAM_PAGE_SORT = [("viewers", pymongo.DESCENDING), ("channel", pymongo.ASCENDING)]
+
+# Niveaux d'agrégats pré-calculés : nom -> troncature de la date de création
+ROLLUP_TIERS = {
+    "hourly": lambda date: date.replace(minute=0, second=0, microsecond=0),
+    "daily": lambda date: date.replace(hour=0, minute=0, second=0, microsecond=0)
+}
+ROLLUP_SPANS = {"hourly": timedelta(hours=1), "daily": timedelta(days=1)}  # Durée d'un bucket
+HOURLY_ROLLUP_MAX_HOURS = 168  # Au-delà, l'historique est servi par les agrégats journaliers
+RAW_SERIES_MAX_HOURS = 48  # Au-delà, les séries temporelles sont lues dans les agrégats
 
 # Initialisation du client MongoDB
 try:
@@ -33,51 +73,541 @@ try:
     db = client[DB_NAME]
     categories_collection = db[CATEGORIES_COLLECTION]
     streams_collection = db[STREAMS_COLLECTION]
+    latest_categories_collection = db[LATEST_CATEGORIES_COLLECTION]
+    latest_streams_collection = db[LATEST_STREAMS_COLLECTION]
+    meta_collection = db[META_COLLECTION]
+    trending_collection = db[TRENDING_COLLECTION]
+    tasks_collection = db[TASKS_COLLECTION]
+    tags_collection = db[TAGS_COLLECTION]
+    categories_rollups = {tier: db[f"{CATEGORIES_COLLECTION}_{tier}"] for tier in ROLLUP_TIERS}
+    streams_rollups = {tier: db[f"{STREAMS_COLLECTION}_{tier}"] for tier in ROLLUP_TIERS}
     
     # Création d'index pour les performances
     categories_collection.create_index([("category", pymongo.ASCENDING), ("timestamp", pymongo.DESCENDING)])
     streams_collection.create_index([("category", pymongo.ASCENDING), ("timestamp", pymongo.DESCENDING)])
     streams_collection.create_index([("channel", pymongo.ASCENDING), ("timestamp", pymongo.DESCENDING)])
+    categories_collection.create_index([("created_at", pymongo.DESCENDING)])
+    streams_collection.create_index([("created_at", pymongo.DESCENDING)])
+    
+    # Index des séries temporelles d'une catégorie ou d'une chaîne
+    categories_collection.create_index([("category", pymongo.ASCENDING), ("created_at", pymongo.ASCENDING)])
+    streams_collection.create_index([("channel", pymongo.ASCENDING), ("created_at", pymongo.ASCENDING)])
+    
+    # Index de l'état courant (une ligne par catégorie / par chaîne)
+    latest_categories_collection.create_index([("category", pymongo.ASCENDING)], unique=True)
+    latest_categories_collection.create_index([("viewers", pymongo.DESCENDING)])
+    latest_streams_collection.create_index([("channel", pymongo.ASCENDING)], unique=True)
+    latest_streams_collection.create_index(STREAM_PAGE_SORT)
+    latest_streams_collection.create_index([("category", pymongo.ASCENDING)] + STREAM_PAGE_SORT)
+    
+    # Dictionnaire des tags et index multiclés (une entrée par tag de chaque ligne)
+    tags_collection.create_index([("name", pymongo.ASCENDING)], unique=True)
+    latest_categories_collection.create_index([("tag_ids", pymongo.ASCENDING), ("viewers", pymongo.DESCENDING)])
+    latest_streams_collection.create_index([("tag_ids", pymongo.ASCENDING)] + STREAM_PAGE_SORT)
+    
+    # Index des agrégats horaires et journaliers
+    for rollup in categories_rollups.values():
+        rollup.create_index([("category", pymongo.ASCENDING), ("bucket", pymongo.ASCENDING)], unique=True)
+        rollup.create_index([("bucket", pymongo.ASCENDING)])
+    for rollup in streams_rollups.values():
+        rollup.create_index(
+            [("channel", pymongo.ASCENDING), ("category", pymongo.ASCENDING), ("bucket", pymongo.ASCENDING)],
+            unique=True
+        )
+        rollup.create_index([("bucket", pymongo.ASCENDING)])
+        rollup.create_index([("category", pymongo.ASCENDING), ("bucket", pymongo.ASCENDING)])
     
     logger.info("Connexion à MongoDB établie avec succès")
 except Exception as e:
     logger.error(f"Erreur de connexion à MongoDB: {e}")
     raise
 
-def save_categories_to_db(categories_data):
-    """Enregistre les données des catégories dans MongoDB."""
+def update_latest(collection, key, documents):
+    """Remplace dans une collection d'état courant la ligne de chaque clé par sa dernière valeur."""
+    operations = [
+        pymongo.ReplaceOne(
+            {key: doc[key]},
+            {field: value for field, value in doc.items() if field != "_id"},
+            upsert=True
+        )
+        for doc in documents
+    ]
+    if operations:
+        with mongo_timer("bulk_write", collection.name):
+            collection.bulk_write(operations, ordered=False)
+
+def split_tags(tags):
+    """Noms des tags d'une ligne : liste du scraper ou chaîne « a, b » des anciennes lignes."""
+    if not tags or tags == NO_TAGS:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return list(dict.fromkeys(tag.strip() for tag in tags if tag and tag.strip()))
+
+def join_tags(names):
+    """Forme texte des tags renvoyée par l'API, identique à l'ancien stockage."""
+    return ", ".join(names) if names else NO_TAGS
+
+def replace_tag_ids(rows, names):
+    """Remplace en place le champ `tag_ids` des lignes par `tags`, d'après {identifiant: nom}."""
+    for row in rows:
+        if "tag_ids" in row:
+            row["tags"] = join_tags([names[tag_id] for tag_id in row.pop("tag_ids") if tag_id in names])
+    return rows
+
+class TagDictionary:
+    """Dictionnaire des tags : chaque nom reçoit une fois pour toutes un identifiant entier.
+    
+    Les lignes stockent `tag_ids` (tableau d'entiers, indexable) au lieu de la chaîne des
+    noms. Les correspondances ne changent jamais et sont gardées en mémoire : seuls les
+    tags encore inconnus du processus coûtent un aller-retour MongoDB.
+    """
+    
+    def __init__(self, collection, counters):
+        self.collection = collection
+        self.counters = counters
+        self.ids = {}
+        self.names = {}
+    
+    def _remember(self, tags):
+        for tag in tags:
+            self.ids[tag["name"]] = tag["_id"]
+            self.names[tag["_id"]] = tag["name"]
+    
+    def _create(self, name):
+        counter = self.counters.find_one_and_update(
+            {"_id": TAG_COUNTER_ID},
+            {"$inc": {"value": 1}},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        tag = {"_id": counter["value"], "name": name}
+        try:
+            self.collection.insert_one(tag)
+        except pymongo.errors.DuplicateKeyError:
+            # Tag créé entre-temps par un autre processus (coordinateur, workers)
+            tag = self.collection.find_one({"name": name})
+        self._remember([tag])
+    
+    def encode(self, names):
+        """Identifiants des noms donnés, en créant les tags inconnus."""
+        missing = [name for name in dict.fromkeys(names) if name not in self.ids]
+        if missing:
+            with mongo_timer("find", self.collection.name):
+                self._remember(self.collection.find({"name": {"$in": missing}}))
+            for name in missing:
+                if name not in self.ids:
+                    self._create(name)
+        return [self.ids[name] for name in names]
+    
+    def decode(self, tag_ids):
+        """Noms des identifiants donnés (les identifiants inconnus sont ignorés)."""
+        missing = [tag_id for tag_id in dict.fromkeys(tag_ids) if tag_id not in self.names]
+        if missing:
+            with mongo_timer("find", self.collection.name):
+                self._remember(self.collection.find({"_id": {"$in": missing}}))
+        return [self.names[tag_id] for tag_id in tag_ids if tag_id in self.names]
+    
+    def encode_rows(self, rows):
+        """Remplace en place le champ `tags` des lignes par `tag_ids`.
+        
+        Les lignes ne sont modifiées qu'une fois tous les identifiants obtenus : en cas
+        d'erreur, elles restent intactes pour le spool.
+        """
+        rows = [row for row in rows if "tags" in row]
+        names = [split_tags(row["tags"]) for row in rows]
+        self.encode([name for row_names in names for name in row_names])
+        for row, row_names in zip(rows, names):
+            row["tag_ids"] = [self.ids[name] for name in row_names]
+            del row["tags"]
+    
+    def decode_rows(self, rows):
+        """Remplace en place le champ `tag_ids` des lignes par la forme texte `tags`."""
+        self.decode([tag_id for row in rows for tag_id in row.get("tag_ids", ())])
+        return replace_tag_ids(rows, self.names)
+
+tag_dictionary = TagDictionary(tags_collection, meta_collection)
+
+def migrate_legacy_tags(batch_size=TAGS_MIGRATION_BATCH):
+    """Convertit une fois les lignes enregistrées avec des tags en chaîne vers `tag_ids`.
+    
+    Les lignes sont parcourues par `_id` croissant (un lot reprend après le dernier `_id`
+    du précédent) : chaque lot est une lecture bornée de l'index, quelle que soit la
+    taille de l'historique. Retourne le nombre de lignes converties.
+    """
+    total = 0
+    try:
+        if meta_collection.find_one({"_id": TAGS_MIGRATION_ID}):
+            return 0
+        
+        for collection in (categories_collection, streams_collection,
+                           latest_categories_collection, latest_streams_collection):
+            converted = 0
+            # Les comparaisons de MongoDB ne portent que sur un type : un parcours par type d'`_id`
+            for id_type in ID_TYPES:
+                id_filter = {"$type": id_type}
+                while True:
+                    rows = list(
+                        collection.find({"tags": {"$exists": True}, "_id": id_filter}, {"tags": 1})
+                        .sort("_id", pymongo.ASCENDING)
+                        .limit(batch_size)
+                    )
+                    if not rows:
+                        break
+                    id_filter = {"$type": id_type, "$gt": rows[-1]["_id"]}
+                    tag_dictionary.encode_rows(rows)
+                    # Une ligne déjà remplacée par le scraper (sans `tags`) n'est pas modifiée
+                    collection.bulk_write([
+                        pymongo.UpdateOne(
+                            {"_id": row["_id"], "tags": {"$exists": True}},
+                            {"$set": {"tag_ids": row["tag_ids"]}, "$unset": {"tags": ""}}
+                        )
+                        for row in rows
+                    ], ordered=False)
+                    converted += len(rows)
+            if converted:
+                logger.info(f"{converted} lignes de {collection.name} converties en identifiants de tags")
+            total += converted
+        
+        meta_collection.update_one(
+            {"_id": TAGS_MIGRATION_ID},
+            {"$set": {"updated_at": datetime.now(), "converted": total}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Erreur lors de la conversion des tags: {e}")
+    return total
+
+def rebuild_latest_snapshot():
+    """Reconstruit l'état courant à partir du dernier cycle de l'historique s'il est vide."""
+    try:
+        if latest_categories_collection.estimated_document_count() == 0:
+            last = categories_collection.find_one(sort=[("created_at", pymongo.DESCENDING)])
+            if last:
+                update_latest(
+                    latest_categories_collection, "category",
+                    categories_collection.find({"created_at": last["created_at"]})
+                )
+        
+        if latest_streams_collection.estimated_document_count() == 0:
+            # Dernier enregistrement de chaque catégorie, puis les streams de cet enregistrement
+            last_per_category = list(streams_collection.aggregate([
+                {"$group": {"_id": "$category", "created_at": {"$max": "$created_at"}}}
+            ]))
+            for last in last_per_category:
+                update_latest(
+                    latest_streams_collection, "channel",
+                    streams_collection.find({"category": last["_id"], "created_at": last["created_at"]})
+                )
+        
+        logger.info("État courant des catégories et des streams initialisé")
+    except Exception as e:
+        logger.error(f"Erreur lors de la reconstruction de l'état courant: {e}")
+
+def update_rollups(rollups, keys, documents):
+    """Ajoute chaque document aux agrégats horaires et journaliers de sa clé."""
+    for tier, truncate in ROLLUP_TIERS.items():
+        operations = [
+            pymongo.UpdateOne(
+                {**{key: doc[key] for key in keys}, "bucket": truncate(doc["created_at"])},
+                {
+                    "$inc": {"sum_viewers": doc["viewers"], "count": 1},
+                    "$max": {"max_viewers": doc["viewers"]},
+                    "$min": {"min_viewers": doc["viewers"]}
+                },
+                upsert=True
+            )
+            for doc in documents
+        ]
+        if operations:
+            with mongo_timer("bulk_write", rollups[tier].name):
+                rollups[tier].bulk_write(operations, ordered=False)
+
+def recompute_rollups(collection, rollups, keys, documents):
+    """Recalcule depuis l'historique brut les buckets d'agrégats touchés par les documents.
+    
+    Les valeurs sont remplacées (`$set`) et non incrémentées : recalculer deux fois le
+    même bucket donne le même résultat, quel que soit l'état laissé par un enregistrement
+    interrompu.
+    """
+    if not documents:
+        return
+    # Le niveau le plus large couvre les autres : une seule lecture de l'historique
+    widest = max(ROLLUP_TIERS, key=lambda tier: ROLLUP_SPANS[tier])
+    ranges = {
+        (tuple(doc[key] for key in keys), ROLLUP_TIERS[widest](doc["created_at"]))
+        for doc in documents
+    }
+    query = {"$or": [
+        {
+            **dict(zip(keys, values)),
+            "created_at": {"$gte": bucket, "$lt": bucket + ROLLUP_SPANS[widest]}
+        }
+        for values, bucket in ranges
+    ]}
+    projection = {"_id": 0, "viewers": 1, "created_at": 1, **{key: 1 for key in keys}}
+    with mongo_timer("find", collection.name):
+        rows = list(collection.find(query, projection))
+    
+    for tier, truncate in ROLLUP_TIERS.items():
+        touched = {(tuple(doc[key] for key in keys), truncate(doc["created_at"])) for doc in documents}
+        points = {}
+        for row in rows:
+            group = (tuple(row[key] for key in keys), truncate(row["created_at"]))
+            if group not in touched:
+                continue
+            point = points.setdefault(group, {
+                "sum_viewers": 0, "max_viewers": row["viewers"], "min_viewers": row["viewers"], "count": 0
+            })
+            point["sum_viewers"] += row["viewers"]
+            point["max_viewers"] = max(point["max_viewers"], row["viewers"])
+            point["min_viewers"] = min(point["min_viewers"], row["viewers"])
+            point["count"] += 1
+        operations = [
+            pymongo.UpdateOne(
+                {**dict(zip(keys, values)), "bucket": bucket},
+                {"$set": point},
+                upsert=True
+            )
+            for (values, bucket), point in points.items()
+        ]
+        if operations:
+            with mongo_timer("bulk_write", rollups[tier].name):
+                rollups[tier].bulk_write(operations, ordered=False)
+
+def rebuild_rollups():
+    """Calcule les agrégats à partir de l'historique brut lorsqu'ils n'existent pas encore."""
+    date_parts = {
+        "hourly": ["year", "month", "day", "hour"],
+        "daily": ["year", "month", "day"]
+    }
+    operators = {"year": "$year", "month": "$month", "day": "$dayOfMonth", "hour": "$hour"}
+    
+    try:
+        for collection, rollups, keys in (
+            (categories_collection, categories_rollups, ["category"]),
+            (streams_collection, streams_rollups, ["channel", "category"])
+        ):
+            for tier, rollup in rollups.items():
+                if rollup.estimated_document_count() > 0 or collection.estimated_document_count() == 0:
+                    continue
+                
+                bucket = {"$dateFromParts": {
+                    part: {operators[part]: "$created_at"} for part in date_parts[tier]
+                }}
+                group_id = {key: f"${key}" for key in keys}
+                group_id["bucket"] = bucket
+                
+                collection.aggregate([
+                    {"$group": {
+                        "_id": group_id,
+                        "sum_viewers": {"$sum": "$viewers"},
+                        "max_viewers": {"$max": "$viewers"},
+                        "min_viewers": {"$min": "$viewers"},
+                        "count": {"$sum": 1}
+                    }},
+                    {"$replaceRoot": {"newRoot": {"$mergeObjects": [
+                        "$_id",
+                        {
+                            "sum_viewers": "$sum_viewers",
+                            "max_viewers": "$max_viewers",
+                            "min_viewers": "$min_viewers",
+                            "count": "$count"
+                        }
+                    ]}}},
+                    {"$merge": {"into": rollup.name, "on": keys + ["bucket"], "whenMatched": "replace"}}
+                ], allowDiskUse=True)
+                logger.info(f"Agrégats {rollup.name} reconstruits à partir de l'historique")
+    except Exception as e:
+        logger.error(f"Erreur lors de la reconstruction des agrégats: {e}")
+
+def get_history_window(hours):
+    """Choisit le niveau d'agrégat et le premier bucket couvrant les `hours` dernières heures."""
+    tier = "hourly" if hours <= HOURLY_ROLLUP_MAX_HOURS else "daily"
+    return tier, ROLLUP_TIERS[tier](datetime.now() - timedelta(hours=hours))
+
+def format_history_point(point, key):
+    """Met un agrégat au format historique (`_id` avec heure, jour, mois) attendu par l'API."""
+    return {
+        "_id": {
+            key: point[key],
+            "hour": point["bucket"].hour,
+            "day": point["bucket"].day,
+            "month": point["bucket"].month
+        },
+        "avg_viewers": point["sum_viewers"] / point["count"],
+        "max_viewers": point["max_viewers"],
+        "min_viewers": point["min_viewers"],
+        "count": point["count"]
+    }
+
+def build_streams_history_pipeline(start_bucket, category=None, channels=None):
+    """Pipeline de lecture des agrégats de streams à partir de `start_bucket`."""
+    match_query = {"bucket": {"$gte": start_bucket}}
+    if category:
+        match_query["category"] = category
+    if channels is not None:
+        match_query["channel"] = {"$in": list(channels)}
+    
+    # Fusionner les agrégats d'une chaîne ayant changé de catégorie dans le même bucket
+    return [
+        {"$match": match_query},
+        {"$group": {
+            "_id": {"channel": "$channel", "bucket": "$bucket"},
+            "sum_viewers": {"$sum": "$sum_viewers"},
+            "max_viewers": {"$max": "$max_viewers"},
+            "min_viewers": {"$min": "$min_viewers"},
+            "count": {"$sum": "$count"}
+        }},
+        {"$sort": {"_id.bucket": 1}}
+    ]
+
+def insert_new(collection, documents):
+    """Insère sans ordre les documents et retourne ceux réellement ajoutés.
+    
+    Les documents déjà présents (clé `_id` dupliquée, lors du rejeu du spool) sont ignorés ;
+    toute autre erreur d'écriture est propagée.
+    """
+    try:
+        with mongo_timer("insert_many", collection.name):
+            collection.insert_many(documents, ordered=False)
+        return documents
+    except pymongo.errors.BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+        return [doc for i, doc in enumerate(documents) if i not in duplicates]
+
+def save_history(collection, rollups, keys, documents):
+    """Insère les documents dans l'historique brut et met à jour les agrégats.
+    
+    Un lot entièrement nouveau est ajouté aux agrégats (`$inc`). Un lot contenant des
+    lignes déjà présentes (rejeu du spool, tâche exécutée deux fois) voit ses buckets
+    recalculés depuis l'historique brut, ce qui corrige aussi des agrégats laissés
+    incomplets par un enregistrement interrompu après l'insertion.
+    Retourne les documents nouvellement insérés.
+    """
+    for doc in documents:
+        doc.setdefault("_id", ObjectId())
+    inserted = insert_new(collection, documents)
+    if len(inserted) < len(documents):
+        recompute_rollups(collection, rollups, keys, documents)
+    else:
+        update_rollups(rollups, keys, inserted)
+    return inserted
+
+def encode_page_cursor(row):
+    """Curseur opaque désignant la dernière ligne d'une page (spectateurs, chaîne)."""
+    raw = json.dumps([row["viewers"], row["channel"]], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_page_cursor(cursor):
+    """Décode un curseur de page ; lève ValueError s'il est invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        viewers, channel = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Curseur de page invalide: {cursor}")
+    if not isinstance(viewers, int) or not isinstance(channel, str):
+        raise ValueError(f"Curseur de page invalide: {cursor}")
+    return viewers, channel
+
+def build_stream_page_query(category=None, after=None):
+    """Filtre des streams situés après la ligne `after` (spectateurs, chaîne) dans STREAM_PAGE_SORT."""
+    query = {"category": category} if category else {}
+    if after is not None:
+        viewers, channel = after
+        query["$or"] = [
+            {"viewers": {"$lt": viewers}},
+            {"viewers": viewers, "channel": {"$gt": channel}}
+        ]
+    return query
+
+def advance_data_generation():
+    """Incrémente le marqueur de génération lu par l'API pour invalider ses caches.
+    
+    Appelé une fois par cycle par l'écriture différée, après la dernière catégorie.
+    """
+    meta_collection.update_one(
+        {"_id": DATA_GENERATION_ID},
+        {"$inc": {"value": 1}, "$set": {"updated_at": datetime.now()}},
+        upsert=True
+    )
+
+def save_categories_to_db(categories_data, snapshot=True):
+    """Enregistre les données des catégories dans MongoDB.
+    
+    `snapshot=False` (rejeu du spool) n'écrit que l'historique et les agrégats, sans
+    remplacer l'état courant par des lignes plus anciennes. Retourne None si le lot est
+    refusé ; lève TRANSIENT_ERRORS si MongoDB est indisponible.
+    """
     try:
         if not categories_data:
             logger.warning("Aucune donnée de catégories à sauvegarder")
             return
         
-        # Ajouter une date de création pour faciliter les requêtes
+        # Ajouter une date de création (conservée si le scraper l'a déjà fixée)
+        now = datetime.now()
         for data in categories_data:
-            data["created_at"] = datetime.now()
+            data.setdefault("created_at", now)
+        created_at = min(data["created_at"] for data in categories_data)
+        
+        # Tags stockés sous forme d'identifiants du dictionnaire
+        tag_dictionary.encode_rows(categories_data)
+        
+        # Insérer les données et les ajouter aux agrégats (lignes nouvelles ou en attente)
+        inserted = save_history(categories_collection, categories_rollups, ["category"], categories_data)
+        logger.info(f"{len(inserted)} catégories enregistrées dans MongoDB")
         
-        # Insérer les données
-        result = categories_collection.insert_many(categories_data)
-        logger.info(f"{len(result.inserted_ids)} catégories enregistrées dans MongoDB")
-        return result.inserted_ids
+        # Mettre à jour l'état courant ; les catégories absentes de ce cycle en sortent
+        if snapshot:
+            update_latest(latest_categories_collection, "category", categories_data)
+            latest_categories_collection.delete_many({"created_at": {"$lt": created_at}})
+        
+        return [data["_id"] for data in inserted]
+    except TRANSIENT_ERRORS:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de l'enregistrement des catégories: {e}")
         return None
 
-def save_streams_to_db(streams_data):
-    """Enregistre les données des streamers dans MongoDB."""
+def save_streams_to_db(streams_data, snapshot=True):
+    """Enregistre les données des streamers dans MongoDB.
+    
+    `snapshot=False` (rejeu du spool) n'écrit que l'historique et les agrégats. Retourne
+    None si le lot est refusé ; lève TRANSIENT_ERRORS si MongoDB est indisponible.
+    """
     try:
         if not streams_data:
             logger.warning("Aucune donnée de streamers à sauvegarder")
             return
         
-        # Ajouter une date de création pour faciliter les requêtes
+        # Ajouter une date de création (conservée si le scraper l'a déjà fixée)
+        now = datetime.now()
         for data in streams_data:
-            data["created_at"] = datetime.now()
+            data.setdefault("created_at", now)
+        created_at = min(data["created_at"] for data in streams_data)
+        
+        # Tags stockés sous forme d'identifiants du dictionnaire
+        tag_dictionary.encode_rows(streams_data)
         
-        # Insérer les données
-        result = streams_collection.insert_many(streams_data)
-        logger.info(f"{len(result.inserted_ids)} streamers enregistrés dans MongoDB")
-        return result.inserted_ids
+        # Insérer les données et les ajouter aux agrégats (lignes nouvelles ou en attente)
+        inserted = save_history(streams_collection, streams_rollups, ["channel", "category"], streams_data)
+        logger.info(f"{len(inserted)} streamers enregistrés dans MongoDB")
+        
+        # Mettre à jour l'état courant ; les chaînes hors ligne des catégories scrapées en sortent
+        if snapshot:
+            update_latest(latest_streams_collection, "channel", streams_data)
+            scraped_categories = list({data["category"] for data in streams_data})
+            latest_streams_collection.delete_many({
+                "category": {"$in": scraped_categories},
+                "created_at": {"$lt": created_at}
+            })
+        
+        return [data["_id"] for data in inserted]
+    except TRANSIENT_ERRORS:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de l'enregistrement des streamers: {e}")
         return None
@@ -85,18 +615,8 @@ def save_streams_to_db(streams_data):
 def get_latest_categories(limit=100):
     """Récupère les dernières catégories de la base de données."""
     try:
-        pipeline = [
-            {"$sort": {"created_at": -1}},
-            {"$group": {
-                "_id": "$category",
-                "doc": {"$first": "$$ROOT"}
-            }},
-            {"$replaceRoot": {"newRoot": "$doc"}},
-            {"$sort": {"viewers": -1}},
-            {"$limit": limit}
-        ]
-        
-        results = list(categories_collection.aggregate(pipeline))
+        results = list(latest_categories_collection.find({}, LATEST_CATEGORY_PROJECTION).sort("viewers", -1).limit(limit))
+        tag_dictionary.decode_rows(results)
         return serialize_mongo_document(results)  # 🔥 Appliquer la conversion
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des catégories: {e}")
@@ -106,23 +626,8 @@ def get_latest_streams(category=None, limit=100):
     """Récupère les derniers streams de la base de données."""
     try:
         query = {"category": category} if category else {}
-
-        if category:
-            results = list(streams_collection.find(query).sort("viewers", -1).limit(limit))
-        else:
-            # Si aucune catégorie n'est spécifiée, récupérer les derniers streams toutes catégories confondues
-            pipeline = [
-                {"$sort": {"created_at": -1}},
-                {"$group": {
-                    "_id": "$channel",
-                    "doc": {"$first": "$$ROOT"}
-                }},
-                {"$replaceRoot": {"newRoot": "$doc"}},
-                {"$sort": {"viewers": -1}},
-                {"$limit": limit}
-            ]
-            results = list(streams_collection.aggregate(pipeline))
-
+        results = list(latest_streams_collection.find(query, LATEST_STREAM_PROJECTION).sort("viewers", -1).limit(limit))
+        tag_dictionary.decode_rows(results)
         return serialize_mongo_document(results)  # 🔥 Convertir ObjectId en str
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des streams: {e}")
@@ -131,29 +636,12 @@ def get_latest_streams(category=None, limit=100):
 def get_categories_history(hours=24):
     """Récupère l'historique des catégories sur une période donnée."""
     try:
-        # Calculer la date limite
-        limit_date = datetime.now()
-        limit_date = limit_date.replace(hour=limit_date.hour - hours)
-        
-        # Requête pour obtenir l'historique
-        pipeline = [
-            {"$match": {"created_at": {"$gt": limit_date}}},
-            {"$group": {
-                "_id": {
-                    "category": "$category",
-                    "hour": {"$hour": "$created_at"},
-                    "day": {"$dayOfMonth": "$created_at"},
-                    "month": {"$month": "$created_at"}
-                },
-                "avg_viewers": {"$avg": "$viewers"},
-                "max_viewers": {"$max": "$viewers"},
-                "min_viewers": {"$min": "$viewers"},
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id.month": 1, "_id.day": 1, "_id.hour": 1}}
-        ]
+        tier, start_bucket = get_history_window(hours)
         
-        results = list(categories_collection.aggregate(pipeline))
+        # Lecture des agrégats pré-calculés
+        with mongo_timer("find", categories_rollups[tier].name):
+            points = categories_rollups[tier].find({"bucket": {"$gte": start_bucket}}, ROLLUP_PROJECTION).sort("bucket", 1)
+            results = [format_history_point(point, "category") for point in points]
         logger.info(f"Récupéré {len(results)} points de données historiques pour les catégories")
         return results
     except Exception as e:
@@ -163,37 +651,37 @@ def get_categories_history(hours=24):
 def get_streams_history(category=None, hours=24):
     """Récupère l'historique des streams sur une période donnée."""
     try:
-        # Calculer la date limite
-        limit_date = datetime.now()
-        limit_date = limit_date.replace(hour=limit_date.hour - hours)
-        
-        # Construire la requête
-        match_query = {"created_at": {"$gt": limit_date}}
-        if category:
-            match_query["category"] = category
-        
-        # Pipeline d'agrégation
-        pipeline = [
-            {"$match": match_query},
-            {"$group": {
-                "_id": {
-                    "channel": "$channel",
-                    "hour": {"$hour": "$created_at"},
-                    "day": {"$dayOfMonth": "$created_at"},
-                    "month": {"$month": "$created_at"}
-                },
-                "avg_viewers": {"$avg": "$viewers"},
-                "max_viewers": {"$max": "$viewers"},
-                "min_viewers": {"$min": "$viewers"},
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id.month": 1, "_id.day": 1, "_id.hour": 1}}
-        ]
+        tier, start_bucket = get_history_window(hours)
+        pipeline = build_streams_history_pipeline(start_bucket, category)
         
-        results = list(streams_collection.aggregate(pipeline))
+        with mongo_timer("aggregate", streams_rollups[tier].name):
+            results = [
+                format_history_point({**point, **point["_id"]}, "channel")
+                for point in streams_rollups[tier].aggregate(pipeline)
+            ]
         logger.info(f"Récupéré {len(results)} points de données historiques pour les streams" + 
                    (f" de {category}" if category else ""))
         return results
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'historique des streams: {e}")
         return []
+
+def prepare_database(background_migration=False):
+    """Conversion des anciens tags, puis état courant et agrégats reconstruits depuis l'historique.
+    
+    Chaque étape parcourt l'historique complet la première fois : elle est lancée une
+    seule fois, par le scraper (standalone ou coordinateur) ou par `python mongodb.py`,
+    et non à l'import du module (API, workers, export). Le scraper convertit les tags
+    en arrière-plan pour ne pas retarder son premier cycle : les lignes non converties
+    restent lisibles entre-temps.
+    """
+    if background_migration:
+        threading.Thread(target=migrate_legacy_tags, name="tags-migration", daemon=True).start()
+    else:
+        migrate_legacy_tags()
+    rebuild_latest_snapshot()
+    rebuild_rollups()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    prepare_database()
@@ -0,0 +1,287 @@
+"""Couche d'accès asynchrone (Motor) utilisée par l'API.
+
+Les lectures ne masquent pas les erreurs MongoDB : elles remontent jusqu'à la route
+(réponse 500), et le cache des réponses ne conserve jamais un résultat vide à la place
+des données.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from metrics import mongo_timer
+
+from mongodb import (
+    MONGO_URI,
+    DB_NAME,
+    LATEST_CATEGORIES_COLLECTION,
+    LATEST_STREAMS_COLLECTION,
+    CATEGORIES_COLLECTION,
+    STREAMS_COLLECTION,
+    META_COLLECTION,
+    TRENDING_COLLECTION,
+    TAGS_COLLECTION,
+    DATA_GENERATION_ID,
+    ROLLUP_TIERS,
+    RAW_SERIES_MAX_HOURS,
+    LATEST_CATEGORY_PROJECTION,
+    LATEST_STREAM_PROJECTION,
+    ROLLUP_PROJECTION,
+    STREAM_PAGE_SORT,
+    serialize_mongo_document,
+    replace_tag_ids,
+    encode_page_cursor,
+    decode_page_cursor,
+    build_stream_page_query,
+    get_history_window,
+    format_history_point,
+    build_streams_history_pipeline
+)
+
+# Configuration du logging
+logger = logging.getLogger("MongoDBAsync")
+
+# Configuration du pool de connexions asynchrones
+MAX_POOL_SIZE = 50  # Requêtes MongoDB simultanées maximales
+MIN_POOL_SIZE = 5  # Connexions gardées ouvertes entre deux rafales
+MAX_IDLE_TIME_MS = 60000
+WAIT_QUEUE_TIMEOUT_MS = 5000  # Échec rapide si le pool est saturé
+
+# Initialisation du client MongoDB asynchrone
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=MAX_POOL_SIZE,
+    minPoolSize=MIN_POOL_SIZE,
+    maxIdleTimeMS=MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS
+)
+db = client[DB_NAME]
+categories_collection = db[CATEGORIES_COLLECTION]
+streams_collection = db[STREAMS_COLLECTION]
+latest_categories_collection = db[LATEST_CATEGORIES_COLLECTION]
+latest_streams_collection = db[LATEST_STREAMS_COLLECTION]
+meta_collection = db[META_COLLECTION]
+trending_collection = db[TRENDING_COLLECTION]
+tags_collection = db[TAGS_COLLECTION]
+categories_rollups = {tier: db[f"{CATEGORIES_COLLECTION}_{tier}"] for tier in ROLLUP_TIERS}
+streams_rollups = {tier: db[f"{STREAMS_COLLECTION}_{tier}"] for tier in ROLLUP_TIERS}
+
+async def get_data_generation():
+    """Lit le marqueur de génération avancé par le scraper après chaque enregistrement."""
+    doc = await meta_collection.find_one({"_id": DATA_GENERATION_ID})
+    return doc["value"] if doc else 0
+
+# Correspondances du dictionnaire des tags (un tag n'est jamais renommé)
+tag_names = {}
+tag_ids = {}
+
+async def load_tag_names(ids):
+    """Complète `tag_names` avec les identifiants encore inconnus du processus."""
+    missing = set(ids) - tag_names.keys()
+    if missing:
+        with mongo_timer("find", tags_collection.name):
+            async for tag in tags_collection.find({"_id": {"$in": list(missing)}}):
+                tag_names[tag["_id"]] = tag["name"]
+
+async def decode_tags(rows):
+    """Remplace `tag_ids` par la forme texte des tags."""
+    await load_tag_names(tag_id for row in rows for tag_id in row.get("tag_ids", ()))
+    return replace_tag_ids(rows, tag_names)
+
+async def get_tag_id(name):
+    """Identifiant d'un tag d'après son nom, ou None s'il n'a jamais été vu."""
+    if name not in tag_ids:
+        with mongo_timer("find_one", tags_collection.name):
+            tag = await tags_collection.find_one({"name": name})
+        if not tag:
+            return None
+        tag_ids[name] = tag["_id"]
+        tag_names[tag["_id"]] = name
+    return tag_ids[name]
+
+async def build_latest_query(category=None, tag=None):
+    """Filtre de l'état courant par catégorie et par tag (index multiclé), ou None si le tag est inconnu."""
+    query = {"category": category} if category else {}
+    if tag:
+        tag_id = await get_tag_id(tag)
+        if tag_id is None:
+            return None
+        query["tag_ids"] = tag_id
+    return query
+
+async def get_latest_categories(limit=100, tag=None):
+    """Récupère les dernières catégories de la base de données."""
+    query = await build_latest_query(tag=tag)
+    if query is None:
+        return []
+    cursor = latest_categories_collection.find(query, LATEST_CATEGORY_PROJECTION).sort("viewers", -1).limit(limit)
+    with mongo_timer("find", latest_categories_collection.name):
+        results = await cursor.to_list(length=limit)
+    await decode_tags(results)
+    return serialize_mongo_document(results)
+
+async def get_latest_streams(category=None, limit=100, tag=None):
+    """Récupère les derniers streams de la base de données."""
+    query = await build_latest_query(category, tag)
+    if query is None:
+        return []
+    cursor = latest_streams_collection.find(query, LATEST_STREAM_PROJECTION).sort("viewers", -1).limit(limit)
+    with mongo_timer("find", latest_streams_collection.name):
+        results = await cursor.to_list(length=limit)
+    await decode_tags(results)
+    return serialize_mongo_document(results)
+
+async def get_streams_page(category=None, limit=100, cursor=None):
+    """Page de l'état courant des streams, paginée par clé (spectateurs, chaîne).
+    
+    Chaque page est une lecture bornée de l'index, quelle que soit sa profondeur.
+    Lève ValueError si le curseur est invalide.
+    """
+    after = decode_page_cursor(cursor) if cursor else None
+    query = build_stream_page_query(category, after)
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    find_cursor = latest_streams_collection.find(query, LATEST_STREAM_PROJECTION).sort(STREAM_PAGE_SORT).limit(limit + 1)
+    with mongo_timer("find", latest_streams_collection.name):
+        rows = await find_cursor.to_list(length=limit + 1)
+    await decode_tags(rows)
+    
+    next_cursor = encode_page_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"streams": rows[:limit], "next_cursor": next_cursor}
+
+async def iter_latest_streams(category=None, batch_size=1000):
+    """Parcourt tout l'état courant des streams directement depuis le curseur MongoDB."""
+    query = {"category": category} if category else {}
+    cursor = latest_streams_collection.find(query, LATEST_STREAM_PROJECTION).sort(STREAM_PAGE_SORT).batch_size(batch_size)
+    async for row in cursor:
+        yield (await decode_tags([row]))[0]
+
+async def get_tag_totals(kind="streams", category=None, limit=50):
+    """Spectateurs et nombre de lignes de l'état courant par tag, du plus regardé au moins regardé."""
+    collection = latest_streams_collection if kind == "streams" else latest_categories_collection
+    pipeline = [{"$match": {"category": category}}] if category else []
+    pipeline += [
+        {"$unwind": "$tag_ids"},
+        {"$group": {"_id": "$tag_ids", "viewers": {"$sum": "$viewers"}, "count": {"$sum": 1}}},
+        {"$sort": {"viewers": -1, "_id": 1}},
+        {"$limit": limit}
+    ]
+    with mongo_timer("aggregate", collection.name):
+        totals = await collection.aggregate(pipeline).to_list(length=limit)
+    await load_tag_names(total["_id"] for total in totals)
+    return [
+        {"tag": tag_names[total["_id"]], "viewers": total["viewers"], "count": total["count"]}
+        for total in totals if total["_id"] in tag_names
+    ]
+
+async def get_categories_history(hours=24):
+    """Récupère l'historique des catégories sur une période donnée."""
+    tier, start_bucket = get_history_window(hours)
+    cursor = categories_rollups[tier].find({"bucket": {"$gte": start_bucket}}, ROLLUP_PROJECTION).sort("bucket", 1)
+    with mongo_timer("find", categories_rollups[tier].name):
+        return [format_history_point(point, "category") async for point in cursor]
+
+async def get_streams_history(category=None, hours=24):
+    """Récupère l'historique des streams sur une période donnée."""
+    tier, start_bucket = get_history_window(hours)
+    pipeline = build_streams_history_pipeline(start_bucket, category)
+    with mongo_timer("aggregate", streams_rollups[tier].name):
+        return [
+            format_history_point({**point, **point["_id"]}, "channel")
+            async for point in streams_rollups[tier].aggregate(pipeline)
+        ]
+
+async def get_series(category=None, channel=None, hours=24):
+    """Série (dates, spectateurs) d'une catégorie ou d'une chaîne, triée par date.
+    
+    Les mesures brutes sont lues jusqu'à RAW_SERIES_MAX_HOURS, puis les moyennes des
+    agrégats horaires ou journaliers. Retourne (source, dates, spectateurs).
+    """
+    field, value = ("category", category) if category else ("channel", channel)
+    if hours <= RAW_SERIES_MAX_HOURS:
+        collection = categories_collection if category else streams_collection
+        start = datetime.now() - timedelta(hours=hours)
+        cursor = collection.find(
+            {field: value, "created_at": {"$gte": start}},
+            {"_id": 0, "created_at": 1, "viewers": 1}
+        ).sort("created_at", 1)
+        source, time_field, viewers_field = "raw", "created_at", "viewers"
+    else:
+        tier, start_bucket = get_history_window(hours)
+        collection = (categories_rollups if category else streams_rollups)[tier]
+        # Une chaîne peut changer de catégorie dans l'heure : ses agrégats sont fusionnés
+        cursor = collection.aggregate([
+            {"$match": {field: value, "bucket": {"$gte": start_bucket}}},
+            {"$group": {"_id": "$bucket", "sum_viewers": {"$sum": "$sum_viewers"}, "count": {"$sum": "$count"}}},
+            {"$project": {"bucket": "$_id", "viewers": {"$divide": ["$sum_viewers", "$count"]}}},
+            {"$sort": {"bucket": 1}}
+        ])
+        source, time_field, viewers_field = tier, "bucket", "viewers"
+    
+    times, viewers = [], []
+    with mongo_timer("series", collection.name):
+        async for point in cursor:
+            times.append(point[time_field])
+            viewers.append(point[viewers_field])
+    return source, times, viewers
+
+async def get_trending(kind, limit=20):
+    """Classement de tendances publié par le scraper (« categories » ou « streams »)."""
+    with mongo_timer("find_one", trending_collection.name):
+        doc = await trending_collection.find_one({"_id": kind}, {"items": {"$slice": limit}, "updated_at": 1})
+    if not doc:
+        return {"items": [], "updated_at": None}
+    return {"items": doc["items"], "updated_at": doc["updated_at"].isoformat()}
+
+async def get_statistics(limit=10):
+    """Récupère en parallèle les catégories et les streams les plus populaires."""
+    top_categories, top_streams = await asyncio.gather(
+        get_latest_categories(limit=limit),
+        get_latest_streams(limit=limit)
+    )
+    return {
+        "top_categories": top_categories,
+        "top_streams": top_streams,
+        "total_viewers": sum(cat.get("viewers", 0) for cat in top_categories)
+    }
+
+async def get_dashboard(hours=24, categories_limit=20, streams_limit=50, top_limit=10, max_attempts=3):
+    """Lit en une fois toutes les données du tableau de bord pour une même génération."""
+    for _ in range(max_attempts):
+        generation = await get_data_generation()
+        categories, streams, categories_history, streams_history = await asyncio.gather(
+            get_latest_categories(limit=max(categories_limit, top_limit)),
+            get_latest_streams(limit=max(streams_limit, top_limit)),
+            get_categories_history(hours=hours),
+            get_streams_history(hours=hours)
+        )
+        # Recommencer si le scraper a enregistré un cycle pendant la lecture
+        if await get_data_generation() == generation:
+            break
+    
+    # Les statistiques réutilisent les lignes déjà lues
+    top_categories = categories[:top_limit]
+    return {
+        "generation": generation,
+        "categories": categories[:categories_limit],
+        "streams": streams[:streams_limit],
+        "categories_history": categories_history,
+        "streams_history": streams_history,
+        "statistics": {
+            "top_categories": top_categories,
+            "top_streams": streams[:top_limit],
+            "total_viewers": sum(cat.get("viewers", 0) for cat in top_categories)
+        }
+    }
+
+async def get_current_history_points(channels=()):
+    """Points d'historique de l'heure en cours, pour les catégories et les chaînes données."""
+    bucket = ROLLUP_TIERS["hourly"](datetime.now())
+    category_points = categories_rollups["hourly"].find({"bucket": bucket}, ROLLUP_PROJECTION)
+    stream_points = streams_rollups["hourly"].aggregate(
+        build_streams_history_pipeline(bucket, channels=channels)
+    )
+    return (
+        [format_history_point(point, "category") async for point in category_points],
+        [format_history_point({**point, **point["_id"]}, "channel") async for point in stream_points]
+    )
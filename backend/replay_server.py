@@ -0,0 +1,368 @@
+"""Serveur local rejouant des pages Twitch (enregistrées ou synthétiques) pour le scraper.
+
+Les pages du répertoire et des catégories sont servies avec un délai de chargement
+configurable, et leurs cartes sont révélées par lots au défilement (scroll infini).
+
+    python replay_server.py serve --port 8900 --recordings recordings
+    python replay_server.py record --out recordings --categories 20
+
+Le scraper s'y connecte via TWITCH_DIRECTORY_URL et TWITCH_CATEGORY_URL :
+    TWITCH_DIRECTORY_URL=http://localhost:8900/directory
+    TWITCH_CATEGORY_URL=http://localhost:8900/directory/category/{category}
+
+Le mode http du scraper interroge le stand-in GQL (mêmes données synthétiques) :
+    SCRAPER_FETCH_MODE=http TWITCH_GQL_URL=http://localhost:8900/gql
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from html import escape
+from urllib.parse import urlparse, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from synthetic import TAGS, synthetic_categories
+
+# Configuration par défaut du rejeu
+LOAD_DELAY = 0.3  # Secondes avant de servir une page
+SCROLL_DELAY = 0.3  # Secondes avant de révéler le lot de cartes suivant
+API_DELAY = 0.05  # Secondes avant de répondre à une requête GQL
+BATCH_SIZE = 20  # Cartes révélées par défilement
+SYNTHETIC_CATEGORIES = 120
+SYNTHETIC_STREAMS = 120
+
+# Révèle les cartes par lots au défilement, sur les pages enregistrées comme synthétiques
+SCROLL_SCRIPT = """
+<script>
+(function () {
+  const config = %s;
+  const roots = [];
+  document.querySelectorAll(config.cardSelector).forEach((el) => {
+    const root = el.closest(config.rootSelector) || el;
+    if (!roots.includes(root)) roots.push(root);
+  });
+  const hidden = roots.slice(config.batchSize).map((root) => {
+    const parent = root.parentNode;
+    parent.removeChild(root);
+    return [parent, root];
+  });
+  let loading = false;
+  window.addEventListener('scroll', () => {
+    if (loading || hidden.length === 0) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;
+    loading = true;
+    setTimeout(() => {
+      hidden.splice(0, config.batchSize).forEach(([parent, root]) => parent.appendChild(root));
+      loading = false;
+    }, config.scrollDelayMs);
+  });
+})();
+</script>
+"""
+
+PAGE_STYLE = """
+<style>
+  .game-card, article { display: block; min-height: 140px; margin: 8px; border: 1px solid #ddd; }
+</style>
+"""
+
+def slugify(category):
+    """Même transformation que le scraper pour construire l'URL d'une catégorie."""
+    return category.lower().replace(' ', '-')
+
+def format_viewers(viewers):
+    """Affiche un nombre de spectateurs au format Twitch (`12.3K viewers`)."""
+    if viewers >= 1000:
+        return f"{viewers / 1000:.1f}K viewers"
+    return f"{viewers} viewers"
+
+class SyntheticSite:
+    """Contenu synthétique déterministe reproduisant le balisage lu par extraction.py."""
+
+    def __init__(self, categories=SYNTHETIC_CATEGORIES, streams=SYNTHETIC_STREAMS, seed=42):
+        self.categories = synthetic_categories(categories, random.Random(seed))
+        self.streams_per_category = streams
+        self.seed = seed
+
+    def category_streams(self, slug):
+        """Streams d'une catégorie, triés par spectateurs (mêmes données que les pages HTML)."""
+        rng = random.Random(f"{self.seed}-{slug}")
+        viewers = sorted((int(20 * rng.paretovariate(1.1)) for _ in range(self.streams_per_category)), reverse=True)
+        return [
+            {
+                "title": f"{slug} stream {i} !",
+                "channel": f"{slug}_channel_{i}",
+                "viewers": count,
+                "tag": rng.choice(TAGS)
+            }
+            for i, count in enumerate(viewers)
+        ]
+
+    def directory_cards(self):
+        return "\n".join(
+            f'<div class="game-card">'
+            f'<img src="{category["image_url"]}">'
+            f'<h2>{escape(category["name"])}</h2>'
+            f'<p>{format_viewers(category["viewers"])}</p>'
+            + "".join(f'<button class="tw-tag"><span>{tag}</span></button>' for tag in category["tags"])
+            + '</div>'
+            for category in self.categories
+        )
+
+    def category_cards(self, slug):
+        return "\n".join(
+            f'<article>'
+            f'<h3 class="CoreText-sc-title">{escape(stream["title"])}</h3>'
+            f'<div class="Layout-sc-1xcs6mc-0 bQImNn">{escape(stream["channel"])}</div>'
+            f'<div class="ScMediaCardStatWrapper-sc-stat">{format_viewers(stream["viewers"])}</div>'
+            f'<button class="ScTag-sc-tag">{stream["tag"]}</button>'
+            f'</article>'
+            for stream in self.category_streams(slug)
+        )
+
+    def gql(self, operation, variables):
+        """Réponse du stand-in GQL aux requêtes de http_fetcher.py, ou None si inconnue."""
+        if operation == "DirectoryGames":
+            return {"data": {"games": {"edges": [
+                {"node": {
+                    "displayName": category["name"],
+                    "viewersCount": category["viewers"],
+                    "boxArtURL": category["image_url"],
+                    "tags": [{"localizedName": tag} for tag in category["tags"]]
+                }}
+                for category in self.categories[:variables.get("first", 100)]
+            ]}}}
+
+        if operation == "GameStreams":
+            names = {category["name"] for category in self.categories}
+            if variables.get("name") not in names:
+                return {"data": {"game": None}}
+            streams = self.category_streams(slugify(variables["name"]))[:variables.get("first", 100)]
+            return {"data": {"game": {"streams": {"edges": [
+                {"node": {
+                    "title": stream["title"],
+                    "viewersCount": stream["viewers"],
+                    "broadcaster": {"displayName": stream["channel"]},
+                    "freeformTags": [{"name": stream["tag"]}]
+                }}
+                for stream in streams
+            ]}}}}
+
+        return None
+
+def scroll_script(card_selector, root_selector, batch_size, scroll_delay):
+    """Script de scroll infini configuré pour un type de page."""
+    return SCROLL_SCRIPT % json.dumps({
+        "cardSelector": card_selector,
+        "rootSelector": root_selector,
+        "batchSize": batch_size,
+        "scrollDelayMs": int(scroll_delay * 1000)
+    })
+
+def render_page(body, script):
+    return (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'>{PAGE_STYLE}</head>"
+        f"<body><main>{body}</main>{script}</body></html>"
+    )
+
+def inject_script(html, script):
+    """Ajoute le script de scroll infini à une page enregistrée."""
+    if "</body>" in html:
+        return html.replace("</body>", script + "</body>", 1)
+    return html + script
+
+class ReplayServer:
+    """Serveur HTTP de rejeu, démarrable dans un thread (benchmarks) ou en ligne de commande."""
+
+    def __init__(self, host="127.0.0.1", port=0, recordings=None, load_delay=LOAD_DELAY,
+                 scroll_delay=SCROLL_DELAY, batch_size=BATCH_SIZE, site=None, api_delay=API_DELAY):
+        self.recordings = recordings
+        self.load_delay = load_delay
+        self.api_delay = api_delay
+        self.scroll_delay = scroll_delay
+        self.batch_size = batch_size
+        self.site = site or SyntheticSite()
+        self.pages_served = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def directory_url(self):
+        return f"{self.base_url}/directory?sort=VIEWER_COUNT"
+
+    @property
+    def category_url(self):
+        return self.base_url + "/directory/category/{category}?sort=VIEWER_COUNT"
+
+    @property
+    def gql_url(self):
+        return f"{self.base_url}/gql"
+
+    def _recorded(self, *parts):
+        if not self.recordings:
+            return None
+        path = os.path.join(self.recordings, *parts)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as recorded:
+            return recorded.read()
+
+    def render(self, path):
+        """HTML de la page demandée, ou None si la route est inconnue."""
+        if path.rstrip("/") == "/directory":
+            script = scroll_script('div[class*="game-card"]', 'div[class*="game-card"]',
+                                   self.batch_size, self.scroll_delay)
+            recorded = self._recorded("directory.html")
+            if recorded is not None:
+                return inject_script(recorded, script)
+            return render_page(self.site.directory_cards(), script)
+
+        prefix = "/directory/category/"
+        if path.startswith(prefix):
+            slug = unquote(path[len(prefix):]).strip("/")
+            script = scroll_script('h3[class*="CoreText"]', 'article', self.batch_size, self.scroll_delay)
+            recorded = self._recorded("category", f"{slug}.html")
+            if recorded is not None:
+                return inject_script(recorded, script)
+            return render_page(self.site.category_cards(slug), script)
+
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                html = server.render(urlparse(self.path).path)
+                if html is None:
+                    self.send_error(404)
+                    return
+
+                time.sleep(server.load_delay)
+                body = html.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.pages_served += 1
+
+            def do_POST(self):
+                if urlparse(self.path).path != "/gql":
+                    self.send_error(404)
+                    return
+
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                answer = server.site.gql(payload.get("operationName"), payload.get("variables") or {})
+                if answer is None:
+                    self.send_error(400)
+                    return
+
+                time.sleep(server.api_delay)
+                body = json.dumps(answer).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.pages_served += 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def record(out_dir, categories):
+    """Enregistre les pages Twitch réelles (sans leurs scripts) pour un rejeu ultérieur."""
+    from driver_pool import get_driver
+    from extraction import extract_categories
+
+    directory_url = "https://www.twitch.tv/directory?sort=VIEWER_COUNT"
+    category_url = "https://www.twitch.tv/directory/category/{category}?sort=VIEWER_COUNT"
+    strip_scripts = (
+        "document.querySelectorAll('script').forEach((s) => s.remove());"
+        "return document.documentElement.outerHTML;"
+    )
+
+    def capture(driver, url, scrolls):
+        driver.get(url)
+        time.sleep(3)
+        for _ in range(scrolls):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(2)
+        return driver.execute_script(strip_scripts)
+
+    os.makedirs(os.path.join(out_dir, "category"), exist_ok=True)
+    driver = get_driver()
+    try:
+        driver.get(directory_url)
+        time.sleep(3)
+        names = [row["category"] for row in extract_categories(driver)][:categories]
+        with open(os.path.join(out_dir, "directory.html"), "w", encoding="utf-8") as page:
+            page.write(capture(driver, directory_url, scrolls=8))
+
+        for name in names:
+            slug = slugify(name)
+            with open(os.path.join(out_dir, "category", f"{slug}.html"), "w", encoding="utf-8") as page:
+                page.write(capture(driver, category_url.format(category=slug), scrolls=3))
+            print(f"Enregistré: {name}")
+    finally:
+        driver.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu local des pages Twitch")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Servir les pages enregistrées ou synthétiques")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8900)
+    serve.add_argument("--recordings", help="Dossier créé par la commande record")
+    serve.add_argument("--load-delay", type=float, default=LOAD_DELAY)
+    serve.add_argument("--scroll-delay", type=float, default=SCROLL_DELAY)
+    serve.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    serve.add_argument("--api-delay", type=float, default=API_DELAY)
+
+    rec = subparsers.add_parser("record", help="Enregistrer les pages Twitch réelles")
+    rec.add_argument("--out", default="recordings")
+    rec.add_argument("--categories", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.out, args.categories)
+        return
+
+    server = ReplayServer(
+        host=args.host, port=args.port, recordings=args.recordings, load_delay=args.load_delay,
+        scroll_delay=args.scroll_delay, batch_size=args.batch_size, api_delay=args.api_delay
+    )
+    print(f"Rejeu disponible sur {server.directory_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
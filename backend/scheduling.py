@@ -0,0 +1,70 @@
+import os
+import random
+import logging
+
+# Configuration du logging
+logger = logging.getLogger("Scheduling")
+
+# Intervalle de rafraîchissement par rang de popularité : (rang maximal, tous les N cycles)
+PRIORITY_TIERS = [
+    (5, 1),   # Top 5 : à chaque cycle
+    (10, 2),  # Rangs 6 à 10 : un cycle sur deux
+    (20, 4),  # Rangs 11 à 20 : un cycle sur quatre
+]
+LONG_TAIL_INTERVAL = 8  # Au-delà du dernier palier
+PAGE_BUDGET_PER_MINUTE = int(os.environ.get("SCRAPER_PAGE_BUDGET", 12))  # Pages chargées par minute, répertoire compris
+CYCLE_JITTER_SECONDS = float(os.environ.get("SCRAPER_JITTER", 5))
+OVERDUE_FACTOR = 2  # Retard (en intervalles) à partir duquel une catégorie passe devant le top
+
+def refresh_interval(rank):
+    """Nombre de cycles entre deux rafraîchissements d'une catégorie de rang `rank` (0 = la plus vue)."""
+    for max_rank, interval in PRIORITY_TIERS:
+        if rank < max_rank:
+            return interval
+    return LONG_TAIL_INTERVAL
+
+def next_start(started_at, interval, now, jitter=CYCLE_JITTER_SECONDS):
+    """Début du prochain cycle : jamais avant la fin du précédent, sans rattrapage des cycles manqués."""
+    return max(started_at + interval, now) + random.uniform(0, jitter)
+
+class CategoryScheduler:
+    """Choisit à chaque cycle les catégories à rafraîchir selon leur priorité et le budget de pages."""
+
+    def __init__(self, page_budget=PAGE_BUDGET_PER_MINUTE, interval_seconds=60):
+        self.page_budget = page_budget
+        self.interval_seconds = interval_seconds
+        self.cycle = 0
+        self.last_scraped = {}  # Catégorie -> numéro du dernier cycle rafraîchi
+
+    @property
+    def pages_per_cycle(self):
+        """Pages de catégories autorisées par cycle (la page du répertoire est toujours chargée)."""
+        return max(1, int(self.page_budget * self.interval_seconds / 60) - 1)
+
+    def staleness(self, category, rank):
+        """Retard relatif d'une catégorie : >= 1 quand elle est due."""
+        last = self.last_scraped.get(category)
+        if last is None:
+            # Jamais rafraîchie : due, et de plus en plus en retard tant qu'elle attend
+            return max(1, self.cycle / refresh_interval(rank))
+        return (self.cycle - last) / refresh_interval(rank)
+
+    def select(self, categories):
+        """Catégories dues ce cycle, par popularité, dans la limite du budget de pages."""
+        self.cycle += 1
+        due = [
+            (self.staleness(category, rank) < OVERDUE_FACTOR, rank, category)
+            for rank, category in enumerate(categories)
+            if self.staleness(category, rank) >= 1
+        ]
+        # Les catégories repoussées trop longtemps par le budget passent en tête
+        due.sort()
+        selected = [category for _, _, category in due[:self.pages_per_cycle]]
+        logger.info(f"Cycle {self.cycle}: {len(selected)}/{len(categories)} catégories à rafraîchir "
+                    f"({len(due)} dues, budget {self.pages_per_cycle} pages)")
+        return selected
+
+    def mark_scraped(self, categories):
+        """Enregistre les catégories effectivement rafraîchies (les échecs restent dues)."""
+        for category in categories:
+            self.last_scraped[category] = self.cycle
@@ -1,16 +1,38 @@
 import os
-import pandas as pd
 import time
-from datetime import datetime
-import schedule
+import queue
+import atexit
+import threading
+import psutil
 import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from mongodb import save_categories_to_db, save_streams_to_db
+from selenium.common.exceptions import TimeoutException
+from driver_pool import DriverPool
+from mongodb import tasks_collection, streams_collection, prepare_database
+from extraction import (
+    CATEGORY_CARD_SELECTOR,
+    STREAM_TITLE_SELECTOR,
+    extract_categories,
+    extract_streams
+)
+from scheduling import CategoryScheduler, next_start
+from writer import WriteBehindWriter
+from http_fetcher import HttpFetcher
+from task_queue import (
+    LocalTaskQueue, get_task_queue, keep_leased, wait_for_cycle, new_cycle_id, default_worker_id
+)
+from trending import TrendingEngine
+from prometheus_client import start_http_server
+from metrics import (
+    SCRAPER_CYCLE_SECONDS,
+    CATEGORY_SCRAPE_SECONDS,
+    CATEGORY_ROWS,
+    SCRAPER_ERRORS,
+    SamplingProfiler,
+    phase_timer
+)
 
 # Configuration du logging
 logging.basicConfig(
@@ -27,99 +49,122 @@ logger = logging.getLogger("TwitchScraper")
 DATA_DIR = "data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# URLs Twitch
-DIRECTORY_URL = "https://www.twitch.tv/directory?sort=VIEWER_COUNT"
-BASE_URL = "https://www.twitch.tv/directory/category/{category}?sort=VIEWER_COUNT"
+# URLs Twitch (surchargeables pour pointer vers replay_server.py)
+DIRECTORY_URL = os.environ.get("TWITCH_DIRECTORY_URL", "https://www.twitch.tv/directory?sort=VIEWER_COUNT")
+BASE_URL = os.environ.get(
+    "TWITCH_CATEGORY_URL",
+    "https://www.twitch.tv/directory/category/{category}?sort=VIEWER_COUNT"
+)
+
+# Mode de récupération : "browser" (Selenium) ou "http" (API GQL, sans navigateur)
+FETCH_MODE = os.environ.get("SCRAPER_FETCH_MODE", "browser")
+
+# Configuration du scraping parallèle des streamers
+MAX_CATEGORIES = int(os.environ.get("SCRAPER_MAX_CATEGORIES", 20))  # À augmenter avec le nombre de workers
+STREAM_WORKERS = int(os.environ.get("SCRAPER_WORKERS", 4))
+BROWSER_MEMORY_MB = 400  # Mémoire estimée d'un Chrome headless
+CYCLE_TIMEOUT = 600  # Durée maximale du scraping des streamers par cycle
 
-# Configuration WebDriver
-def get_driver():
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# Mode distribué : "standalone", "coordinator" (publie les tâches) ou "worker" (les exécute)
+SCRAPER_ROLE = os.environ.get("SCRAPER_ROLE", "standalone")
+TASK_QUEUE = os.environ.get("SCRAPER_TASK_QUEUE", "mongo")  # "local" (standalone) : workers dans le processus
+WORKER_POLL_SECONDS = 2
+
+# Configuration du chargement par défilement
+CATEGORY_TARGET = int(os.environ.get("SCRAPER_CATEGORY_TARGET", 100))  # Catégories voulues sur le répertoire
+STREAM_TARGET = int(os.environ.get("SCRAPER_STREAM_TARGET", 100))  # Streamers voulus par catégorie
+SCROLL_TIMEOUT_INITIAL = 2.0  # Attente maximale des nouvelles cartes avant adaptation
+SCROLL_TIMEOUT_MIN = 0.5
+SCROLL_TIMEOUT_MAX = 3.0
+SCROLL_POLL_INTERVAL = 0.1
+
+# Observabilité : port des métriques Prometheus et profilage optionnel d'un cycle
+METRICS_PORT = int(os.environ.get("SCRAPER_METRICS_PORT", 9101))
+PROFILE_PATH = os.environ.get("SCRAPER_PROFILE")  # Fichier « collapsed stacks » du premier cycle
+
+# Écriture différée : le scraper n'attend jamais MongoDB ; les tendances suivent chaque lot enregistré
+# (un worker ne voit qu'une partie des catégories : les tendances sont calculées par le coordinateur)
+trending_engine = TrendingEngine()
+writer = WriteBehindWriter(on_saved=trending_engine.observe if SCRAPER_ROLE != "worker" else None)
+atexit.register(writer.close)
+
+# Client HTTP du mode sans navigateur, conservé entre les cycles
+http_fetcher = HttpFetcher()
+atexit.register(http_fetcher.close)
 
 # Fonctions auxiliaires
-def convert_viewers_count(viewers_text):
-    """Convertit le nombre de spectateurs du format Twitch en entier."""
-    if not viewers_text:
-        return 0
-        
-    viewers_text = viewers_text.replace(" viewers", "").replace(",", "").strip()
-    
-    if "K" in viewers_text:
-        return int(float(viewers_text.replace("K", "")) * 1000)
-    
-    if "." in viewers_text:
-        return int(float(viewers_text) * 1000)
-    
-    return int(viewers_text) if viewers_text.isdigit() else 0
+def get_worker_count(requested=STREAM_WORKERS):
+    """Limite le nombre de navigateurs parallèles à la mémoire disponible."""
+    available_mb = psutil.virtual_memory().available // (1024 * 1024)
+    max_by_memory = max(1, available_mb // BROWSER_MEMORY_MB)
+    return max(1, min(requested, max_by_memory))
+
+# Pool de navigateurs persistants, partagé par tous les cycles
+driver_pool = DriverPool(size=get_worker_count())
+atexit.register(driver_pool.close)
 
-def scroll_to_load_more(driver, max_scrolls=10):
-    """Défile pour charger plus de contenu."""
-    last_height = driver.execute_script("return document.body.scrollHeight")
+def count_cards(driver, selector):
+    """Compte les cartes présentes dans le DOM."""
+    return driver.execute_script("return document.querySelectorAll(arguments[0]).length", selector)
+
+def scroll_to_load_more(driver, selector, target_count=None, max_scrolls=10):
+    """Défile jusqu'à obtenir `target_count` cartes, en attendant l'apparition des nouvelles."""
+    count = count_cards(driver, selector)
+    timeout = SCROLL_TIMEOUT_INITIAL
     
     for i in range(max_scrolls):
-        logger.info(f"Scroll {i+1}/{max_scrolls}")
+        if target_count and count >= target_count:
+            break
+        
+        logger.info(f"Scroll {i+1}/{max_scrolls} ({count} cartes)")
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)
+        start_time = time.monotonic()
         
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=SCROLL_POLL_INTERVAL).until(
+                lambda d: count_cards(d, selector) > count
+            )
+        except TimeoutException:
+            # Plus rien ne se charge : fin de la liste
             break
-        last_height = new_height
+        
+        # Adapter le délai d'attente à la vitesse de chargement observée
+        elapsed = time.monotonic() - start_time
+        timeout = min(SCROLL_TIMEOUT_MAX, max(SCROLL_TIMEOUT_MIN, elapsed * 3))
+        count = count_cards(driver, selector)
+    
+    return count
 
 def scrape_twitch_categories():
     """Scrape les catégories Twitch et les enregistre dans la base de données."""
     logger.info("Démarrage du scraping des catégories Twitch")
-    driver = get_driver()
     
     try:
-        driver.get(DIRECTORY_URL)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, '//div[contains(@class, "game-card")]'))
-        )
+        pooled = driver_pool.acquire()
+    except Exception as e:
+        logger.error(f"Impossible d'obtenir un navigateur: {e}")
+        return []
+    driver = pooled.driver
+    
+    try:
+        with phase_timer("page_load"):
+            driver.get(DIRECTORY_URL)
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.XPATH, '//div[contains(@class, "game-card")]'))
+            )
         
         # Défiler pour charger plus de catégories
-        scroll_to_load_more(driver, max_scrolls=8)
-        
-        # Scraper les catégories
-        category_elements = driver.find_elements(By.XPATH, '//div[contains(@class, "game-card")]')
-        logger.info(f"Trouvé {len(category_elements)} catégories")
+        with phase_timer("scroll"):
+            scroll_to_load_more(driver, CATEGORY_CARD_SELECTOR, target_count=CATEGORY_TARGET, max_scrolls=8)
         
-        categories_data = []
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Extraire toutes les catégories en un seul appel
+        with phase_timer("extraction"):
+            categories_data = extract_categories(driver)
+        logger.info(f"Trouvé {len(categories_data)} catégories")
         
-        for category_element in category_elements:
-            try:
-                category_name_element = category_element.find_elements(By.XPATH, './/h2')
-                category_name = category_name_element[0].text.strip() if category_name_element else "Unknown"
-                
-                viewers_element = category_element.find_elements(By.XPATH, './/p')
-                viewers_count = convert_viewers_count(viewers_element[0].text) if viewers_element else 0
-                
-                tag_elements = category_element.find_elements(By.XPATH, './/button[contains(@class, "tw-tag")]//span')
-                tags = ", ".join([tag.text.strip() for tag in tag_elements if tag.text.strip()]) if tag_elements else "No Tags"
-                
-                image_element = category_element.find_elements(By.XPATH, './/img')
-                image_url = image_element[0].get_attribute("src") if image_element else "No Image"
-                
-                if category_name != "Unknown" and viewers_count > 0:
-                    category_data = {
-                        "timestamp": timestamp,
-                        "category": category_name,
-                        "viewers": viewers_count,
-                        "tags": tags,
-                        "image_url": image_url
-                    }
-                    categories_data.append(category_data)
-            
-            except Exception as e:
-                logger.error(f"Erreur lors du scraping de la catégorie: {e}")
-        
-        # Enregistrer dans MongoDB
+        # Enregistrer dans MongoDB (en arrière-plan)
         if categories_data:
-            save_categories_to_db(categories_data)
+            writer.submit("categories", categories_data)
             logger.info(f"Scraping des catégories terminé. {len(categories_data)} catégories scrapées.")
             
             # Retourner les noms des catégories pour le scraping des streamers
@@ -128,116 +173,317 @@ def scrape_twitch_categories():
         return []
     
     except Exception as e:
+        SCRAPER_ERRORS.labels(phase="categories").inc()
         logger.error(f"Erreur lors du scraping des catégories: {e}")
         return []
     
     finally:
-        driver.quit()
+        driver_pool.release(pooled)
+
+def scrape_category_streams(driver, category):
+    """Scrape les streamers d'une catégorie et retourne les lignes structurées."""
+    category_url = BASE_URL.format(category=category.lower().replace(' ', '-'))
+    logger.info(f"Scraping des streamers pour {category}")
+    
+    with phase_timer("page_load"):
+        driver.get(category_url)
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, '//h3[contains(@class, "CoreText")]'))
+        )
+    
+    # Scroll pour charger plus de streamers
+    with phase_timer("scroll"):
+        scroll_to_load_more(driver, STREAM_TITLE_SELECTOR, target_count=STREAM_TARGET, max_scrolls=3)
+    
+    # Extraire tous les streamers en un seul appel
+    with phase_timer("extraction"):
+        return extract_streams(driver, category)
+
+def _stream_worker(tasks, results):
+    """Worker : emprunte un navigateur du pool pour chaque catégorie de la file.
+    
+    Les lignes de chaque catégorie partent aussitôt vers l'écriture différée ;
+    seul leur nombre est conservé dans `results`.
+    """
+    while True:
+        try:
+            category = tasks.get_nowait()
+        except queue.Empty:
+            return
+        
+        try:
+            with driver_pool.driver() as driver:
+                with CATEGORY_SCRAPE_SECONDS.labels(category=category).time():
+                    streams_data = scrape_category_streams(driver, category)
+            writer.submit("streams", streams_data)
+            results[category] = len(streams_data)
+            CATEGORY_ROWS.labels(category=category).set(len(streams_data))
+            logger.info(f"Données scrapées pour {category}: {len(streams_data)} streamers")
+        except Exception as e:
+            # Une catégorie en échec n'interrompt pas les autres
+            SCRAPER_ERRORS.labels(phase="streams").inc()
+            logger.error(f"Erreur lors du scraping de {category}: {e}")
 
-def scrape_twitch_streams(categories):
-    """Scrape les streamers pour chaque catégorie."""
+def scrape_twitch_streams(categories, workers=STREAM_WORKERS):
+    """Scrape les streamers pour chaque catégorie avec un pool de navigateurs.
+    
+    Retourne le nombre de streamers enregistrés par catégorie scrapée.
+    """
     if not categories:
         logger.warning("Aucune catégorie à scraper pour les streamers")
-        return
+        return {}
+    
+    categories = categories[:MAX_CATEGORIES]
+    workers = min(get_worker_count(workers), driver_pool.size, len(categories))
+    logger.info(f"Démarrage du scraping des streamers pour {len(categories)} catégories ({workers} navigateurs)")
+    start_time = time.monotonic()
+    
+    tasks = queue.Queue()
+    for category in categories:
+        tasks.put(category)
+    
+    results = {}
+    threads = [
+        threading.Thread(target=_stream_worker, args=(tasks, results), daemon=True)
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    
+    deadline = time.monotonic() + CYCLE_TIMEOUT
+    for thread in threads:
+        thread.join(timeout=max(0, deadline - time.monotonic()))
     
-    logger.info(f"Démarrage du scraping des streamers pour {len(categories)} catégories")
-    driver = get_driver()
-    all_streams = []
+    if any(thread.is_alive() for thread in threads):
+        # Fermer les navigateurs bloqués pour libérer leurs workers
+        logger.error("Délai du cycle dépassé, fermeture des navigateurs bloqués")
+        driver_pool.kill_busy()
     
+    for category in categories:
+        if category not in results:
+            logger.warning(f"Aucun streamer récupéré pour {category}")
+    
+    logger.info(f"Scraping des streamers terminé. {sum(results.values())} streamers scrapés "
+                f"en {time.monotonic() - start_time:.1f}s.")
+    return dict(results)
+
+def fetch_twitch_categories():
+    """Récupère les catégories via l'API GQL et les enregistre (mode http)."""
+    logger.info("Récupération des catégories Twitch via l'API")
     try:
-        for category in categories[:20]:  # Limiter à 20 catégories pour éviter de surcharger
-            category_url = BASE_URL.format(category=category.lower().replace(' ', '-'))
-            logger.info(f"Scraping des streamers pour {category}")
-            
-            driver.get(category_url)
-            time.sleep(3)
-            
+        with phase_timer("http_fetch"):
+            categories_data = http_fetcher.fetch_categories()
+        logger.info(f"Trouvé {len(categories_data)} catégories")
+        writer.submit("categories", categories_data)
+        return [item["category"] for item in categories_data]
+    except Exception as e:
+        SCRAPER_ERRORS.labels(phase="categories").inc()
+        logger.error(f"Erreur lors de la récupération des catégories: {e}")
+        return []
+
+def fetch_twitch_streams(categories):
+    """Récupère en parallèle les streamers des catégories via l'API GQL (mode http)."""
+    if not categories:
+        logger.warning("Aucune catégorie à récupérer pour les streamers")
+        return {}
+    
+    categories = categories[:MAX_CATEGORIES]
+    start_time = time.monotonic()
+    with phase_timer("http_fetch"):
+        streams = http_fetcher.fetch_streams(categories)
+    
+    for category, streams_data in streams.items():
+        writer.submit("streams", streams_data)
+        CATEGORY_ROWS.labels(category=category).set(len(streams_data))
+    logger.info(f"Récupération des streamers terminée. {sum(len(rows) for rows in streams.values())} streamers "
+                f"en {time.monotonic() - start_time:.1f}s.")
+    return {category: len(streams_data) for category, streams_data in streams.items()}
+
+def get_scrapers(mode=FETCH_MODE):
+    """Fonctions (catégories, streamers) du mode de récupération choisi."""
+    if mode == "http":
+        return fetch_twitch_categories, fetch_twitch_streams
+    return scrape_twitch_categories, scrape_twitch_streams
+
+def scrape_task(category, cycle_id):
+    """Scrape une catégorie pour une tâche du coordinateur et retourne ses lignes.
+    
+    L'`_id` de chaque ligne est déterminé par (cycle, catégorie, chaîne) : une tâche
+    exécutée deux fois (bail expiré puis repris) n'insère pas de doublons.
+    """
+    if FETCH_MODE == "http":
+        with phase_timer("http_fetch"):
+            streams_data = http_fetcher.fetch_streams([category]).get(category)
+        if streams_data is None:
+            raise RuntimeError(f"Échec de la récupération de {category}")
+    else:
+        with driver_pool.driver() as driver:
+            streams_data = scrape_category_streams(driver, category)
+    for row in streams_data:
+        row["_id"] = f"{cycle_id}:{category}:{row['channel']}"
+    return streams_data
+
+def _task_worker(task_queue, worker_id, stop):
+    """Worker distribué : prend en bail les tâches publiées par le coordinateur.
+    
+    Une tâche n'est marquée terminée qu'une fois ses lignes écrites (ou mises en spool) :
+    le coordinateur peut alors faire avancer la génération des données.
+    """
+    while not stop.is_set():
+        try:
+            task = task_queue.lease(worker_id)
+        except Exception as e:
+            logger.error(f"Erreur lors de la prise d'une tâche: {e}")
+            task = None
+        if task is None:
+            stop.wait(WORKER_POLL_SECONDS)
+            continue
+        
+        category = task["category"]
+        try:
+            with keep_leased(task_queue, task, worker_id):
+                with CATEGORY_SCRAPE_SECONDS.labels(category=category).time():
+                    streams_data = scrape_task(category, task["cycle_id"])
+            writer.submit("streams", streams_data)
+            writer.join()
+            CATEGORY_ROWS.labels(category=category).set(len(streams_data))
+            task_queue.complete(task, worker_id, rows=len(streams_data))
+            logger.info(f"Tâche {task['_id']} terminée: {len(streams_data)} streamers")
+        except Exception as e:
+            SCRAPER_ERRORS.labels(phase="streams").inc()
+            logger.error(f"Erreur lors du scraping de {category} (tentative {task['attempts']}): {e}")
             try:
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, '//h3[contains(@class, "CoreText")]'))
-                )
-                
-                # Scroll pour charger plus de streamers
-                scroll_to_load_more(driver, max_scrolls=3)
-                
-                # Scraper les streamers
-                streamers = driver.find_elements(By.XPATH, '//h3[contains(@class, "CoreText")]')
-                streamer_titles = [s.text for s in streamers if s.text.strip()]
-                
-                channels = driver.find_elements(By.XPATH, '//div[contains(@class, "Layout-sc-1xcs6mc-0 bQImNn")]')
-                channel_names = [c.text for c in channels if c.text.strip()]
-                
-                viewers = driver.find_elements(By.XPATH, '//div[contains(@class, "ScMediaCardStatWrapper")]')
-                viewers_counts = [convert_viewers_count(v.text) for v in viewers if v.text.strip()]
-                
-                tags = driver.find_elements(By.XPATH, '//button[contains(@class, "ScTag")]')
-                tags_list = [t.text for t in tags if t.text.strip()]
-                
-                # Assurer la longueur minimale
-                min_length = min(len(streamer_titles), len(channel_names), len(viewers_counts))
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Structurer les données
-                for i in range(min_length):
-                    if i < len(tags_list):
-                        tag = tags_list[i]
-                    else:
-                        tag = "No Tags"
-                    
-                    stream_data = {
-                        "timestamp": timestamp,
-                        "category": category,
-                        "title": streamer_titles[i],
-                        "channel": channel_names[i],
-                        "viewers": viewers_counts[i],
-                        "tags": tag
-                    }
-                    all_streams.append(stream_data)
-                
-                logger.info(f"Données scrapées pour {category}: {len(all_streams)} streamers")
-            
+                task_queue.fail(task, worker_id, error=str(e))
             except Exception as e:
-                logger.error(f"Erreur lors du scraping de {category}: {e}")
-        
-        # Enregistrer dans MongoDB
-        if all_streams:
-            save_streams_to_db(all_streams)
-            logger.info(f"Scraping des streamers terminé. {len(all_streams)} streamers scrapés.")
-    
-    except Exception as e:
-        logger.error(f"Erreur lors du scraping des streamers: {e}")
+                logger.error(f"Erreur lors de la libération de la tâche {task['_id']}: {e}")
+
+def start_task_workers(task_queue, workers=STREAM_WORKERS, worker_id=None, stop=None):
+    """Démarre les threads workers ; un seul en mode http (le client est déjà concurrent)."""
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    count = 1 if FETCH_MODE == "http" else min(get_worker_count(workers), driver_pool.size)
+    threads = [
+        threading.Thread(
+            target=_task_worker, args=(task_queue, f"{worker_id}:{i}", stop),
+            name=f"task-worker-{i}", daemon=True
+        )
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info(f"{count} workers démarrés ({worker_id})")
+    return threads
+
+def start_metrics_server():
+    """Expose les métriques du scraper (processus distinct de l'API)."""
+    try:
+        start_http_server(METRICS_PORT)
+        logger.info(f"Métriques disponibles sur le port {METRICS_PORT}")
+    except OSError as e:
+        logger.error(f"Erreur lors du démarrage du serveur de métriques: {e}")
+
+def start_worker(workers=STREAM_WORKERS):
+    """Démarre un processus worker : exécute les tâches de la file partagée jusqu'à l'arrêt."""
+    logger.info(f"Démarrage du worker (mode {FETCH_MODE})")
+    start_metrics_server()
+    if FETCH_MODE != "http":
+        driver_pool.warm()
+    threads = start_task_workers(get_task_queue("worker", TASK_QUEUE, tasks_collection), workers)
+    for thread in threads:
+        thread.join()
+
+def run_scraper(scheduler=None, task_queue=None):
+    """Exécute le processus complet de scraping.
     
-    finally:
-        driver.quit()
-
-def run_scraper():
-    """Exécute le processus complet de scraping."""
-    logger.info("Démarrage du cycle de scraping")
-    categories = scrape_twitch_categories()
-    if categories:
-        scrape_twitch_streams(categories)
+    Avec un planificateur, seules les catégories dues ce cycle (selon leur rang et le
+    budget de pages) sont rafraîchies ; sans, toutes les catégories le sont. Avec une
+    file de tâches, les catégories sont publiées pour les workers au lieu d'être scrapées.
+    """
+    logger.info(f"Démarrage du cycle de scraping (mode {FETCH_MODE})")
+    scrape_categories, scrape_streams = get_scrapers()
+    with SCRAPER_CYCLE_SECONDS.time():
+        categories = scrape_categories()[:MAX_CATEGORIES]
+        if categories and scheduler is not None:
+            categories = scheduler.select(categories)
+        if task_queue is not None and not isinstance(task_queue, LocalTaskQueue):
+            # Streams enregistrés par les workers des autres processus
+            try:
+                trending_engine.follow("streams", streams_collection)
+            except Exception as e:
+                logger.error(f"Erreur lors du suivi des streams des workers: {e}")
+        if categories and task_queue is not None:
+            cycle_id = new_cycle_id()
+            published = task_queue.publish(cycle_id, categories)
+            if scheduler is not None:
+                scheduler.mark_scraped(categories)
+            logger.info(f"{published} tâches publiées pour les workers")
+            if not wait_for_cycle(task_queue, cycle_id, CYCLE_TIMEOUT, WORKER_POLL_SECONDS):
+                logger.warning(f"Tâches du cycle {cycle_id} encore en cours après {CYCLE_TIMEOUT}s")
+            # Lignes écrites par les workers : la génération avance même sans écriture locale
+            writer.end_cycle(force=True)
+        elif categories:
+            scraped = scrape_streams(categories)
+            if scheduler is not None:
+                scheduler.mark_scraped(category for category, rows in scraped.items() if rows)
+            # Une seule avancée de la génération, une fois toutes les lignes du cycle écrites
+            writer.end_cycle()
     logger.info("Cycle de scraping terminé")
 
+def run_profiled_scraper(path, scheduler=None, task_queue=None):
+    """Exécute un cycle sous le profileur par échantillonnage et écrit ses piles dans `path`."""
+    with SamplingProfiler() as profiler:
+        run_scraper(scheduler, task_queue)
+    profiler.write(path)
+
 # Fonction pour démarrer le planificateur
-def start_scheduler(interval_minutes=1):
-    """Démarre le planificateur pour exécuter le scraper à intervalles réguliers."""
-    logger.info(f"Démarrage du planificateur - Intervalle: {interval_minutes} minutes")
+def start_scheduler(interval_minutes=1, role=SCRAPER_ROLE):
+    """Démarre le planificateur : cycles sans chevauchement ni rattrapage, avec gigue.
+    
+    En rôle "coordinator", chaque cycle publie ses catégories dans la file MongoDB ; en
+    rôle "standalone" avec la file locale, les workers tournent dans ce même processus.
+    """
+    logger.info(f"Démarrage du planificateur ({role}) - Intervalle: {interval_minutes} minutes")
+    interval = interval_minutes * 60
+    scheduler = CategoryScheduler(interval_seconds=interval)
+    task_queue = get_task_queue(role, TASK_QUEUE, tasks_collection)
     
-    # Exécuter une fois au démarrage
-    run_scraper()
+    # Un seul processus prépare la base (les workers et l'API n'y touchent pas)
+    prepare_database(background_migration=True)
+    start_metrics_server()
     
-    # Planifier les exécutions régulières
-    schedule.every(interval_minutes).minutes.do(run_scraper)
+    # Démarrer les navigateurs une seule fois pour tous les cycles
+    if FETCH_MODE != "http":
+        driver_pool.warm()
+    if isinstance(task_queue, LocalTaskQueue):
+        start_task_workers(task_queue)
     
-    # Boucle de planification
+    # Le premier cycle démarre immédiatement (profilé si SCRAPER_PROFILE est défini)
+    profile_path = PROFILE_PATH
+    next_run = time.monotonic()
     while True:
+        delay = next_run - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        
+        started_at = time.monotonic()
         try:
-            schedule.run_pending()
-            time.sleep(30)  # Vérifier toutes les 30 secondes
+            if profile_path:
+                run_profiled_scraper(profile_path, scheduler, task_queue)
+                profile_path = None
+            else:
+                run_scraper(scheduler, task_queue)
         except Exception as e:
             logger.error(f"Erreur dans la boucle de planification: {e}")
-            time.sleep(60)  # Attendre 1 minute en cas d'erreur
+        
+        # Un cycle plus long que l'intervalle décale le suivant au lieu de l'empiler
+        next_run = next_start(started_at, interval, time.monotonic())
+        elapsed = time.monotonic() - started_at
+        if elapsed > interval:
+            logger.warning(f"Cycle de {elapsed:.0f}s plus long que l'intervalle de {interval}s")
 
 if __name__ == "__main__":
-    # Démarrer le scraper avec des exécutions toutes les 15 minutes
-    start_scheduler(1)
+    # Démarrer le scraper avec des exécutions toutes les minutes (SCRAPER_ROLE=worker : exécuter les tâches)
+    if SCRAPER_ROLE == "worker":
+        start_worker()
+    else:
+        start_scheduler(1)
@@ -0,0 +1,22 @@
+"""Données Twitch synthétiques communes aux harnais de benchmark.
+
+bench_api.py en tire l'historique de l'API, replay_server.py les pages et les
+réponses GQL servies au scraper : les deux mesurent les mêmes catégories.
+"""
+
+TAGS = ["English", "Français", "Español", "Deutsch", "IRL", "FPS", "RPG", "Chill", "Competitive", "Speedrun"]
+
+def box_art_url(index):
+    return f"https://static-cdn.jtvnw.net/ttv-boxart/{index}-188x250.jpg"
+
+def synthetic_categories(count, rng):
+    """Catégories dont l'audience décroît en loi de puissance avec le rang, deux tags chacune."""
+    return [
+        {
+            "name": f"Category {i}",
+            "viewers": int(400000 / (i + 1) ** 0.9),
+            "tags": rng.sample(TAGS, 2),
+            "image_url": box_art_url(i)
+        }
+        for i in range(count)
+    ]
@@ -0,0 +1,279 @@
+"""File de tâches de scraping partagée entre un coordinateur et plusieurs workers.
+
+Chaque cycle du coordinateur publie une tâche par catégorie (`_id` = cycle:catégorie).
+Un worker prend une tâche en bail (lease) pour LEASE_SECONDS, le renouvelle tant qu'il
+travaille (heartbeat) puis la marque terminée. Un bail expiré (worker arrêté ou bloqué)
+rend la tâche à nouveau disponible, jusqu'à MAX_ATTEMPTS tentatives. Le coordinateur
+attend que plus aucune tâche du cycle ne soit en cours (`pending_count`) avant de le
+considérer terminé.
+"""
+import os
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+import pymongo
+from pymongo import ReturnDocument
+
+# Configuration du logging
+logger = logging.getLogger("TaskQueue")
+
+# Configuration des baux
+LEASE_SECONDS = 120  # Durée d'un bail sans heartbeat
+HEARTBEAT_SECONDS = 30  # Fréquence de renouvellement du bail
+MAX_ATTEMPTS = 3  # Tentatives avant abandon d'une tâche
+TASK_RETENTION_SECONDS = 24 * 3600  # Tâches supprimées (index TTL) au-delà
+
+ROLES = ("standalone", "coordinator", "worker")
+QUEUE_KINDS = ("mongo", "local")
+
+def new_cycle_id(now=None):
+    """Identifiant d'un cycle du coordinateur, trié chronologiquement."""
+    return (now or datetime.now()).strftime("%Y%m%dT%H%M%S")
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def task_id(cycle_id, category):
+    return f"{cycle_id}:{category}"
+
+class MongoTaskQueue:
+    """File de tâches stockée dans une collection MongoDB, partagée entre machines."""
+
+    def __init__(self, collection, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        collection.create_index([("status", pymongo.ASCENDING), ("cycle_id", pymongo.DESCENDING), ("rank", pymongo.ASCENDING)])
+        collection.create_index([("cycle_id", pymongo.ASCENDING)])
+        collection.create_index([("created_at", pymongo.ASCENDING)], expireAfterSeconds=TASK_RETENTION_SECONDS)
+
+    def publish(self, cycle_id, categories):
+        """Publie les tâches d'un cycle ; republier le même cycle n'a pas d'effet."""
+        now = datetime.now()
+        tasks = [
+            {
+                "_id": task_id(cycle_id, category),
+                "cycle_id": cycle_id,
+                "category": category,
+                "rank": rank,
+                "status": "pending",
+                "attempts": 0,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "created_at": now
+            }
+            for rank, category in enumerate(categories)
+        ]
+        if not tasks:
+            return 0
+        # Les tâches encore en attente des cycles précédents sont remplacées par celles-ci
+        self.collection.update_many(
+            {"status": "pending", "cycle_id": {"$lt": cycle_id}},
+            {"$set": {"status": "superseded"}}
+        )
+        try:
+            self.collection.insert_many(tasks, ordered=False)
+            return len(tasks)
+        except pymongo.errors.BulkWriteError as e:
+            return e.details.get("nInserted", 0)
+
+    def lease(self, worker_id):
+        """Prend en bail la tâche disponible la plus prioritaire, ou None."""
+        now = datetime.now()
+        return self.collection.find_one_and_update(
+            {
+                "attempts": {"$lt": self.max_attempts},
+                "$or": [
+                    {"status": "pending"},
+                    {"status": "leased", "lease_expires_at": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "leased",
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("cycle_id", pymongo.DESCENDING), ("rank", pymongo.ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def heartbeat(self, task, worker_id):
+        """Prolonge le bail ; False si la tâche a été reprise par un autre worker."""
+        result = self.collection.update_one(
+            {"_id": task["_id"], "status": "leased", "lease_owner": worker_id},
+            {"$set": {"lease_expires_at": datetime.now() + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.matched_count == 1
+
+    def complete(self, task, worker_id, rows=0):
+        self.collection.update_one(
+            {"_id": task["_id"], "lease_owner": worker_id},
+            {"$set": {"status": "done", "rows": rows, "completed_at": datetime.now()}}
+        )
+
+    def fail(self, task, worker_id, error=None):
+        """Rend la tâche disponible, ou l'abandonne après MAX_ATTEMPTS tentatives."""
+        status = "failed" if task["attempts"] >= self.max_attempts else "pending"
+        self.collection.update_one(
+            {"_id": task["_id"], "lease_owner": worker_id},
+            {"$set": {"status": status, "lease_owner": None, "lease_expires_at": None, "error": error}}
+        )
+
+    def pending_count(self, cycle_id):
+        """Tâches du cycle encore à exécuter : en attente, en bail, ou bail expiré à reprendre."""
+        return self.collection.count_documents({
+            "cycle_id": cycle_id,
+            "$or": [
+                {"status": "pending"},
+                {"status": "leased", "lease_expires_at": {"$gte": datetime.now()}},
+                {"status": "leased", "attempts": {"$lt": self.max_attempts}}
+            ]
+        })
+
+class LocalTaskQueue:
+    """Équivalent en mémoire de MongoTaskQueue, pour un coordinateur et ses workers dans un seul processus."""
+
+    def __init__(self, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.tasks = {}
+        self._lock = threading.Lock()
+
+    def publish(self, cycle_id, categories):
+        published = 0
+        with self._lock:
+            # Comme avec MongoDB : tâches en attente remplacées, tâches terminées oubliées
+            for key, task in list(self.tasks.items()):
+                if task["cycle_id"] >= cycle_id:
+                    continue
+                if task["status"] == "pending":
+                    task["status"] = "superseded"
+                if task["status"] != "leased":
+                    del self.tasks[key]
+            for rank, category in enumerate(categories):
+                key = task_id(cycle_id, category)
+                if key not in self.tasks:
+                    self.tasks[key] = {
+                        "_id": key, "cycle_id": cycle_id, "category": category, "rank": rank,
+                        "status": "pending", "attempts": 0, "lease_owner": None, "lease_expires_at": None
+                    }
+                    published += 1
+        return published
+
+    def lease(self, worker_id):
+        now = datetime.now()
+        with self._lock:
+            available = [
+                task for task in self.tasks.values()
+                if task["attempts"] < self.max_attempts and (
+                    task["status"] == "pending"
+                    or (task["status"] == "leased" and task["lease_expires_at"] < now)
+                )
+            ]
+            if not available:
+                return None
+            newest = max(task["cycle_id"] for task in available)
+            task = min((task for task in available if task["cycle_id"] == newest), key=lambda task: task["rank"])
+            task.update(
+                status="leased", lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                attempts=task["attempts"] + 1
+            )
+            return dict(task)
+
+    def heartbeat(self, task, worker_id):
+        with self._lock:
+            current = self.tasks.get(task["_id"])
+            if not current or current["status"] != "leased" or current["lease_owner"] != worker_id:
+                return False
+            current["lease_expires_at"] = datetime.now() + timedelta(seconds=self.lease_seconds)
+            return True
+
+    def complete(self, task, worker_id, rows=0):
+        with self._lock:
+            current = self.tasks.get(task["_id"])
+            if current and current["lease_owner"] == worker_id:
+                current.update(status="done", rows=rows)
+
+    def fail(self, task, worker_id, error=None):
+        with self._lock:
+            current = self.tasks.get(task["_id"])
+            if current and current["lease_owner"] == worker_id:
+                status = "failed" if current["attempts"] >= self.max_attempts else "pending"
+                current.update(status=status, lease_owner=None, lease_expires_at=None, error=error)
+
+    def pending_count(self, cycle_id):
+        now = datetime.now()
+        with self._lock:
+            return sum(
+                1 for task in self.tasks.values()
+                if task["cycle_id"] == cycle_id and (
+                    task["status"] == "pending"
+                    or (task["status"] == "leased" and (
+                        task["lease_expires_at"] >= now or task["attempts"] < self.max_attempts
+                    ))
+                )
+            )
+
+def wait_for_cycle(task_queue, cycle_id, timeout, poll_seconds):
+    """Attend que toutes les tâches du cycle soient terminées ou abandonnées.
+    
+    Retourne False si des tâches sont encore en cours après `timeout` secondes.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if task_queue.pending_count(cycle_id) == 0:
+                return True
+        except Exception as e:
+            logger.error(f"Erreur lors du suivi du cycle {cycle_id}: {e}")
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_seconds)
+
+def get_task_queue(role, kind, collection):
+    """File de tâches d'un processus selon son rôle.
+    
+    Coordinateur et workers sont des processus distincts : ils partagent la file MongoDB.
+    Un processus autonome scrape lui-même ses catégories, ou les répartit entre des
+    workers internes avec la file locale. Lève ValueError sur une combinaison invalide.
+    """
+    if role not in ROLES:
+        raise ValueError(f"Rôle inconnu: {role} (attendu: {', '.join(ROLES)})")
+    if kind not in QUEUE_KINDS:
+        raise ValueError(f"File de tâches inconnue: {kind} (attendu: {', '.join(QUEUE_KINDS)})")
+    if role == "standalone":
+        return LocalTaskQueue() if kind == "local" else None
+    if kind == "local":
+        raise ValueError(f"Le rôle {role} nécessite la file MongoDB : une file locale n'est pas "
+                         f"partagée entre processus (utiliser le rôle standalone)")
+    return MongoTaskQueue(collection)
+
+@contextmanager
+def keep_leased(task_queue, task, worker_id, interval=HEARTBEAT_SECONDS):
+    """Renouvelle le bail d'une tâche en arrière-plan pendant son traitement."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                if not task_queue.heartbeat(task, worker_id):
+                    logger.warning(f"Bail perdu pour {task['_id']}, la tâche a été reprise")
+                    return
+            except Exception as e:
+                logger.error(f"Erreur lors du renouvellement du bail de {task['_id']}: {e}")
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{task['_id']}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,26 @@
+"""Configuration des tests : modules du backend importables, MongoDB remplacé par mongomock."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_api import install_in_memory_backend
+
+# Avant tout import de mongodb.py : clients sync et async sur une même base en mémoire
+install_in_memory_backend()
+
+@pytest.fixture
+def mongodb():
+    """Module mongodb sur une base vidée (index conservés) et des dictionnaires de tags vides."""
+    import mongodb as module
+    for name in module.db.list_collection_names():
+        module.db[name].delete_many({})
+    module.tag_dictionary.ids.clear()
+    module.tag_dictionary.names.clear()
+    # Caches de lecture de l'API (les tags ne sont jamais supprimés en production)
+    import mongodb_async
+    mongodb_async.tag_names.clear()
+    mongodb_async.tag_ids.clear()
+    return module
@@ -0,0 +1,43 @@
+"""API : encodage JSON par défaut et réponses 304 sur ETag."""
+import warnings
+from datetime import datetime
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from fastapi.testclient import TestClient
+
+
+def test_categories_json_and_etag(mongodb):
+    import api
+
+    mongodb.save_categories_to_db([{
+        "category": "Chess", "viewers": 1200, "tags": "Strategy, English",
+        "image_url": "", "timestamp": datetime(2026, 10, 1, 12).isoformat()
+    }])
+    client = TestClient(api.app)
+
+    response = client.get("/api/categories")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert [row["category"] for row in response.json()] == ["Chess"]
+
+    etag = response.headers["etag"]
+    cached = client.get("/api/categories", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+
+def test_uncached_route_uses_default_json_response(mongodb):
+    import api
+
+    mongodb.save_streams_to_db([{
+        "channel": "alpha", "category": "Chess", "title": "Blitz", "viewers": 300,
+        "tags": "English", "timestamp": datetime(2026, 10, 1, 12).isoformat()
+    }])
+    response = TestClient(api.app).get("/api/streams/page", params={"limit": 10})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    page = response.json()
+    assert [row["channel"] for row in page["streams"]] == ["alpha"]
+    assert page["streams"][0]["tags"] == "English"
@@ -0,0 +1,17 @@
+"""Cache des réponses : correspondance des ETag."""
+from cache import ResponseCache, etag_matches
+
+
+def test_etag_matches_if_none_match_forms():
+    etag = ResponseCache.etag(("categories", (), 1))
+    other = ResponseCache.etag(("categories", (), 2))
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches(f"{other}, W/{etag}", etag)
+    assert etag_matches(f"{other},{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(other, etag)
+    assert not etag_matches(etag.strip('"'), etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
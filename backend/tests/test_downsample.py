@@ -0,0 +1,90 @@
+"""Sous-échantillonnage : LTTB et min/max comparés à des implémentations de référence en Python pur."""
+import math
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from downsample import lttb, minmax, downsample_series
+
+
+def reference_lttb(x, y, threshold):
+    """LTTB tel que décrit par Steinarsson (2013), point par point."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    previous = 0
+    for i in range(threshold - 2):
+        avg_start = math.floor((i + 1) * every) + 1
+        avg_end = min(math.floor((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+
+        best_area, best = -1.0, None
+        for j in range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1):
+            area = abs((x[previous] - avg_x) * (y[j] - y[previous]) - (x[previous] - x[j]) * (avg_y - y[previous])) / 2
+            if area > best_area:
+                best_area, best = area, j
+        selected.append(best)
+        previous = best
+    selected.append(n - 1)
+    return selected
+
+
+def reference_minmax(x, y, threshold):
+    """Minimum et maximum de chaque seau des points intérieurs, plus les extrémités."""
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return list(range(n))
+    buckets = (threshold - 2) // 2
+    every = (n - 2) / buckets
+    kept = {0, n - 1}
+    for i in range(buckets):
+        bucket = range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1)
+        kept.add(min(bucket, key=lambda j: y[j]))
+        kept.add(max(bucket, key=lambda j: y[j]))
+    return sorted(kept)
+
+
+def random_series(n, seed):
+    rng = random.Random(seed)
+    x = sorted(rng.sample(range(n * 10), n))
+    y, value = [], 1000.0
+    for _ in range(n):
+        value = max(0.0, value + rng.gauss(0, 50))
+        y.append(value)
+    return x, y
+
+
+@pytest.mark.parametrize("n,threshold", [(10, 3), (101, 10), (1000, 37), (5000, 500), (997, 996)])
+def test_lttb_matches_reference(n, threshold):
+    x, y = random_series(n, seed=n + threshold)
+    result = lttb(np.array(x), np.array(y), threshold)
+    assert result.tolist() == reference_lttb(x, y, threshold)
+
+
+@pytest.mark.parametrize("n,threshold", [(10, 4), (101, 10), (1000, 37), (5000, 500), (997, 996)])
+def test_minmax_matches_reference(n, threshold):
+    x, y = random_series(n, seed=n * threshold)
+    result = minmax(np.array(x), np.array(y), threshold)
+    assert result.tolist() == reference_minmax(x, y, threshold)
+
+
+def test_small_series_are_kept_whole():
+    x, y = random_series(20, seed=1)
+    assert lttb(np.array(x), np.array(y), 20).tolist() == list(range(20))
+    assert minmax(np.array(x), np.array(y), 3).tolist() == list(range(20))
+
+
+def test_downsample_series_keeps_endpoints():
+    start = datetime(2026, 10, 1)
+    times = [start + timedelta(minutes=i) for i in range(1440)]
+    viewers = [1000 + (i % 60) * 10 for i in range(1440)]
+    series = downsample_series(times, viewers, 100)
+    assert len(series) == 100
+    assert series[0] == {"timestamp": times[0].isoformat(), "viewers": 1000}
+    assert series[-1]["timestamp"] == times[-1].isoformat()
+    assert downsample_series([], [], 100) == []
@@ -0,0 +1,39 @@
+"""Diffusion en direct : diff des lignes et statistiques du tableau de bord."""
+import asyncio
+
+import orjson
+
+from live import LiveBroadcaster
+
+
+def test_update_carries_statistics():
+    snapshots = [
+        ([{"category": "Chess", "viewers": 300}, {"category": "Art", "viewers": 100}],
+         [{"channel": "alpha", "category": "Chess", "viewers": 300}]),
+        ([{"category": "Chess", "viewers": 500}, {"category": "Art", "viewers": 100}],
+         [{"channel": "alpha", "category": "Chess", "viewers": 500}])
+    ]
+
+    async def load_snapshot():
+        categories, streams = snapshots.pop(0)
+        return categories, streams, ([], [])
+
+    async def scenario():
+        broadcaster = LiveBroadcaster(get_generation=None, load_snapshot=load_snapshot,
+                                      format_history=lambda points, key: points)
+        client = broadcaster.subscribe()
+        await client.__anext__()  # Message de bienvenue
+        await broadcaster._publish(1)
+        await broadcaster._publish(2)
+        return await client.__anext__()
+
+    message = asyncio.run(scenario())
+    event, data = message.decode("utf-8").strip().split("\n")
+    assert event == "event: update"
+    payload = orjson.loads(data[len("data: "):])
+    assert payload["categories"] == {
+        "changed": [{"category": "Chess", "viewers": 500, "tags": None, "image_url": None}], "removed": []
+    }
+    assert payload["statistics"]["total_viewers"] == 600
+    assert [row["category"] for row in payload["statistics"]["top_categories"]] == ["Chess", "Art"]
+    assert payload["statistics"]["last_update"]
@@ -0,0 +1,54 @@
+"""Agrégats horaires et journaliers : rejouer un lot ne compte pas deux fois ses lignes."""
+from datetime import datetime, timedelta
+
+
+def stream_rows(start, viewers):
+    return [
+        {"_id": f"row-{i}", "channel": "alpha", "category": "Chess", "viewers": value,
+         "created_at": start + timedelta(minutes=10 * i)}
+        for i, value in enumerate(viewers)
+    ]
+
+
+def rollup_points(mongodb, tier):
+    return sorted(
+        (point["bucket"], point["sum_viewers"], point["count"], point["min_viewers"], point["max_viewers"])
+        for point in mongodb.streams_rollups[tier].find({"channel": "alpha"})
+    )
+
+
+def save(mongodb, rows):
+    return mongodb.save_history(mongodb.streams_collection, mongodb.streams_rollups,
+                                ["channel", "category"], [dict(row) for row in rows])
+
+
+def test_replayed_batch_is_not_counted_twice(mongodb):
+    start = datetime(2026, 10, 1, 10, 30)
+    rows = stream_rows(start, [100, 200, 300, 400])
+
+    assert len(save(mongodb, rows)) == 4
+    expected = {tier: rollup_points(mongodb, tier) for tier in ("hourly", "daily")}
+    assert expected["hourly"] == [
+        (datetime(2026, 10, 1, 10), 600, 3, 100, 300),
+        (datetime(2026, 10, 1, 11), 400, 1, 400, 400)
+    ]
+    assert expected["daily"] == [(datetime(2026, 10, 1), 1000, 4, 100, 400)]
+
+    # Rejeu complet puis rejeu partiel avec une ligne nouvelle
+    assert save(mongodb, rows) == []
+    assert {tier: rollup_points(mongodb, tier) for tier in expected} == expected
+    extra = stream_rows(start, [100, 200, 300, 400, 500])
+    assert [row["_id"] for row in save(mongodb, extra)] == ["row-4"]
+    assert rollup_points(mongodb, "hourly")[-1] == (datetime(2026, 10, 1, 11), 900, 2, 400, 500)
+    assert rollup_points(mongodb, "daily") == [(datetime(2026, 10, 1), 1500, 5, 100, 500)]
+
+
+def test_replay_repairs_rollups_after_interrupted_save(mongodb):
+    start = datetime(2026, 10, 1, 10, 0)
+    rows = stream_rows(start, [100, 200])
+    # Enregistrement interrompu entre l'insertion et les agrégats
+    mongodb.streams_collection.insert_many([dict(row) for row in rows])
+
+    assert save(mongodb, rows) == []
+    assert rollup_points(mongodb, "hourly") == [(datetime(2026, 10, 1, 10), 300, 2, 100, 200)]
+    assert rollup_points(mongodb, "daily") == [(datetime(2026, 10, 1), 300, 2, 100, 200)]
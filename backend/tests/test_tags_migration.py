@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+def legacy_rows(count, start=0):
+    created_at = datetime(2026, 1, 1)
+    return [
+        {
+            "_id": ObjectId() if i % 3 else f"20260101T000000:Category:channel_{i}",
+            "category": "Category",
+            "channel": f"channel_{i}",
+            "viewers": i,
+            "tags": "English, IRL" if i % 2 else "No Tags",
+            "created_at": created_at
+        }
+        for i in range(start, start + count)
+    ]
+
+def test_migration_converts_collections_larger_than_a_batch(mongodb):
+    mongodb.streams_collection.insert_many(legacy_rows(25))
+    mongodb.streams_collection.insert_one({"_id": ObjectId(), "channel": "new", "tag_ids": [7]})
+
+    assert mongodb.migrate_legacy_tags(batch_size=4) == 25
+    assert mongodb.streams_collection.count_documents({"tags": {"$exists": True}}) == 0
+    assert mongodb.streams_collection.count_documents({"tag_ids": {"$exists": True}}) == 26
+
+    english, irl = mongodb.tag_dictionary.encode(["English", "IRL"])
+    assert mongodb.streams_collection.find_one({"channel": "channel_1"})["tag_ids"] == [english, irl]
+    assert mongodb.streams_collection.find_one({"channel": "channel_2"})["tag_ids"] == []
+    assert mongodb.streams_collection.find_one({"channel": "new"})["tag_ids"] == [7]
+
+def test_migration_runs_only_once(mongodb):
+    mongodb.categories_collection.insert_many(legacy_rows(5))
+    assert mongodb.migrate_legacy_tags(batch_size=2) == 5
+
+    # Lignes arrivées après la migration : plus aucun parcours
+    mongodb.categories_collection.insert_many(legacy_rows(3, start=5))
+    assert mongodb.migrate_legacy_tags(batch_size=2) == 0
+    assert mongodb.categories_collection.count_documents({"tags": {"$exists": True}}) == 3
@@ -0,0 +1,90 @@
+"""File de tâches : baux, reprise après expiration, abandon et suivi d'un cycle."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from task_queue import LocalTaskQueue, MongoTaskQueue, get_task_queue
+
+
+@pytest.fixture(params=["local", "mongo"])
+def task_queue(request):
+    if request.param == "local":
+        return LocalTaskQueue(max_attempts=2)
+    mongodb = request.getfixturevalue("mongodb")
+    return MongoTaskQueue(mongodb.tasks_collection, max_attempts=2)
+
+
+def expire(task_queue, task):
+    """Simule un worker arrêté : son bail est dépassé."""
+    expired = datetime.now() - timedelta(seconds=1)
+    if isinstance(task_queue, LocalTaskQueue):
+        task_queue.tasks[task["_id"]]["lease_expires_at"] = expired
+    else:
+        task_queue.collection.update_one({"_id": task["_id"]}, {"$set": {"lease_expires_at": expired}})
+
+
+def test_lease_newest_cycle_first_by_rank(task_queue):
+    task_queue.publish("20261001T100000", ["Chess", "Art"])
+    task_queue.publish("20261001T100100", ["Music", "Chess"])
+
+    leased = [task_queue.lease("a")["_id"] for _ in range(2)]
+    assert leased == ["20261001T100100:Music", "20261001T100100:Chess"]
+    # Les tâches en attente du cycle précédent ont été remplacées
+    assert task_queue.lease("a") is None
+
+
+def test_expired_lease_is_redelivered(task_queue):
+    task_queue.publish("c1", ["Chess"])
+    first = task_queue.lease("a")
+    assert task_queue.lease("b") is None
+
+    expire(task_queue, first)
+    second = task_queue.lease("b")
+    assert second["_id"] == first["_id"]
+    assert second["attempts"] == 2
+    assert second["lease_owner"] == "b"
+
+    # L'ancien worker a perdu son bail : ni heartbeat ni fin de tâche
+    assert not task_queue.heartbeat(first, "a")
+    task_queue.complete(first, "a")
+    assert task_queue.pending_count("c1") == 1
+    assert task_queue.heartbeat(second, "b")
+    task_queue.complete(second, "b", rows=10)
+    assert task_queue.pending_count("c1") == 0
+
+
+def test_task_abandoned_after_max_attempts(task_queue):
+    task_queue.publish("c1", ["Chess", "Art"])
+    task = task_queue.lease("a")
+    task_queue.fail(task, "a", error="timeout")
+    assert task_queue.pending_count("c1") == 2
+
+    retried = task_queue.lease("a")
+    assert retried["_id"] == task["_id"] and retried["attempts"] == 2
+    task_queue.fail(retried, "a", error="timeout")
+    assert task_queue.pending_count("c1") == 1
+
+    other = task_queue.lease("a")
+    assert other["_id"] == "c1:Art"
+    expire(task_queue, other)
+    assert task_queue.pending_count("c1") == 1
+    other = task_queue.lease("b")
+    expire(task_queue, other)
+    # Bail expiré à la dernière tentative : plus rien à attendre pour ce cycle
+    assert task_queue.lease("c") is None
+    assert task_queue.pending_count("c1") == 0
+
+
+def test_get_task_queue_by_role(mongodb):
+    collection = mongodb.tasks_collection
+    assert get_task_queue("standalone", "mongo", collection) is None
+    assert isinstance(get_task_queue("standalone", "local", collection), LocalTaskQueue)
+    assert isinstance(get_task_queue("coordinator", "mongo", collection), MongoTaskQueue)
+    assert isinstance(get_task_queue("worker", "mongo", collection), MongoTaskQueue)
+    for role in ("coordinator", "worker"):
+        with pytest.raises(ValueError):
+            get_task_queue(role, "local", collection)
+    with pytest.raises(ValueError):
+        get_task_queue("scheduler", "mongo", collection)
+    with pytest.raises(ValueError):
+        get_task_queue("worker", "redis", collection)
@@ -0,0 +1,97 @@
+"""Écriture différée : spool sur erreur de connexion, mise de côté des lots refusés."""
+import os
+
+from bson import json_util
+from pymongo.errors import AutoReconnect
+
+from writer import WriteBehindWriter
+
+
+class FakeSaver:
+    """Saver en mémoire : refuse les lots contenant une ligne `poison`, lève AutoReconnect si `down`."""
+
+    def __init__(self):
+        self.saved = []
+        self.down = False
+
+    def __call__(self, rows, snapshot=True):
+        if self.down:
+            raise AutoReconnect("MongoDB indisponible")
+        if any(row.get("poison") for row in rows):
+            return None
+        self.saved.extend(row["name"] for row in rows)
+        return [row.get("_id") for row in rows]
+
+
+def rows(*names, poison=()):
+    return [{"name": name, "poison": name in poison} for name in names]
+
+
+def read_ndjson(path):
+    with open(path, encoding="utf-8") as f:
+        return [json_util.loads(line)["name"] for line in f]
+
+
+def make_writer(saver, tmp_path):
+    return WriteBehindWriter(savers={"streams": saver}, spool_dir=str(tmp_path), batch_size=2,
+                             on_cycle_end=None)
+
+
+def test_refused_batch_is_dead_lettered_and_writer_stays_healthy(tmp_path):
+    saver = FakeSaver()
+    writer = make_writer(saver, tmp_path)
+
+    writer.submit("streams", rows("a", "b", "c", "d", "e", "f", poison={"a"}))
+    writer.join()
+    writer.close()
+
+    assert saver.saved == ["c", "d", "e", "f"]
+    assert read_ndjson(writer._dead_letter_path("streams")) == ["a", "b"]
+    assert not os.path.exists(writer._spool_path("streams"))
+    assert writer._healthy
+
+
+def test_replay_moves_poisoned_batch_aside_and_continues(tmp_path):
+    saver = FakeSaver()
+    writer = make_writer(saver, tmp_path)
+
+    # MongoDB indisponible : tout part dans le spool, le lot empoisonné en premier
+    saver.down = True
+    writer._write("streams", rows("a", "b", "c", "d", "e", "f", poison={"b"}))
+    assert not writer._healthy
+    assert read_ndjson(writer._spool_path("streams")) == ["a", "b", "c", "d", "e", "f"]
+
+    # Toujours indisponible : le rejeu s'arrête sans rien perdre
+    writer.replay_spool()
+    assert not writer._healthy
+    assert saver.saved == []
+
+    saver.down = False
+    writer.replay_spool()
+
+    assert writer._healthy
+    assert saver.saved == ["c", "d", "e", "f"]
+    assert read_ndjson(writer._dead_letter_path("streams")) == ["a", "b"]
+    assert not os.path.exists(writer._spool_path("streams"))
+    assert not os.path.exists(writer._spool_path("streams") + ".replay")
+
+
+def test_generation_advances_once_per_cycle(tmp_path):
+    cycles = []
+    writer = WriteBehindWriter(savers={"streams": FakeSaver()}, spool_dir=str(tmp_path),
+                               on_cycle_end=lambda: cycles.append(1))
+
+    # Rien d'enregistré : pas d'avancée, sauf si le coordinateur la force
+    writer.end_cycle()
+    writer.join()
+    assert cycles == []
+    writer.end_cycle(force=True)
+    writer.join()
+    assert cycles == [1]
+
+    writer.submit("streams", rows("a", "b"))
+    writer.end_cycle()
+    writer.end_cycle()
+    writer.join()
+    writer.close()
+    assert cycles == [1, 1]
@@ -0,0 +1,155 @@
+import math
+import logging
+from datetime import datetime, timedelta
+
+from metrics import mongo_timer
+from mongodb import trending_collection
+
+# Configuration du logging
+logger = logging.getLogger("Trending")
+
+# Configuration de la détection des tendances
+HALF_LIFE_SECONDS = 30 * 60  # Demi-vie de la moyenne mobile exponentielle
+MIN_OBSERVATIONS = 5  # Mesures nécessaires avant de classer une série
+MIN_VIEWERS = {"categories": 1000, "streams": 50}  # En dessous, les variations sont du bruit
+MIN_STD_RATIO = 0.02  # Écart-type plancher, relatif à la moyenne
+BREAKOUT_ZSCORE = 3.0  # Seuil d'un stream en percée
+STALE_SECONDS = 15 * 60  # Séries absentes du classement au-delà
+PRUNE_SECONDS = 6 * 3600  # Séries oubliées au-delà
+LEADERBOARD_SIZE = 50
+FOLLOW_LAG_SECONDS = 30  # Lignes des workers possiblement encore en cours d'écriture
+
+KEY_FIELDS = {"categories": "category", "streams": "channel"}
+
+class SeriesState:
+    """État glissant d'une série : moyenne et variance exponentielles, dernier écart."""
+
+    __slots__ = ("mean", "var", "last", "delta", "growth", "zscore", "count", "seen_at", "category")
+
+    def __init__(self, viewers, seen_at, category=None):
+        self.mean = float(viewers)
+        self.var = 0.0
+        self.last = viewers
+        self.delta = 0
+        self.growth = 0.0
+        self.zscore = 0.0
+        self.count = 1
+        self.seen_at = seen_at
+        self.category = category
+
+    def update(self, viewers, seen_at, category=None):
+        # Écart mesuré par rapport à la référence précédente, avant de l'actualiser
+        std = max(math.sqrt(self.var), MIN_STD_RATIO * self.mean, 1.0)
+        diff = viewers - self.mean
+        self.zscore = diff / std
+        self.growth = diff / self.mean if self.mean else 0.0
+        self.delta = viewers - self.last
+
+        # Pondération dépendant du temps écoulé : les cycles irréguliers restent comparables
+        elapsed = max((seen_at - self.seen_at).total_seconds(), 0.0)
+        alpha = 1 - math.exp(-elapsed * math.log(2) / HALF_LIFE_SECONDS)
+        increment = alpha * diff
+        self.mean += increment
+        self.var = (1 - alpha) * (self.var + diff * increment)
+
+        self.last = viewers
+        self.count += 1
+        self.seen_at = seen_at
+        if category is not None:
+            self.category = category
+
+class TrendingEngine:
+    """Met à jour les tendances à chaque enregistrement et publie les classements.
+
+    Chaque ligne enregistrée coûte une mise à jour O(1) de sa série ; les classements
+    (catégories en hausse, streams en percée) sont écrits dans un seul document par type,
+    que l'API lit directement. L'état est en mémoire : après un redémarrage, une série
+    est classée à nouveau après MIN_OBSERVATIONS mesures.
+    """
+
+    def __init__(self, collection=trending_collection, leaderboard_size=LEADERBOARD_SIZE):
+        self.collection = collection
+        self.leaderboard_size = leaderboard_size
+        self.states = {kind: {} for kind in KEY_FIELDS}
+        self.followed_until = {}
+
+    def observe(self, kind, rows):
+        """Intègre les lignes d'un enregistrement puis republie le classement du type."""
+        states = self.states[kind]
+        key_field = KEY_FIELDS[kind]
+        for row in rows:
+            key = row[key_field]
+            category = row.get("category") if kind == "streams" else None
+            state = states.get(key)
+            if state is None:
+                states[key] = SeriesState(row["viewers"], row["created_at"], category)
+            elif row["created_at"] > state.seen_at:
+                state.update(row["viewers"], row["created_at"], category)
+
+        try:
+            self.publish(kind)
+        except Exception as e:
+            logger.error(f"Erreur lors de la publication des tendances ({kind}): {e}")
+
+    def follow(self, kind, collection, now=None):
+        """Intègre les lignes enregistrées par d'autres processus (workers) depuis le dernier appel.
+        
+        Le classement est ainsi calculé et publié par un seul processus, même si les
+        catégories sont scrapées par plusieurs workers. Les lignes plus récentes que
+        FOLLOW_LAG_SECONDS sont laissées au prochain appel.
+        """
+        now = now or datetime.now()
+        until = now - timedelta(seconds=FOLLOW_LAG_SECONDS)
+        since = self.followed_until.get(kind, until - timedelta(seconds=STALE_SECONDS))
+        if until <= since:
+            return
+        key_field = KEY_FIELDS[kind]
+        cursor = collection.find(
+            {"created_at": {"$gt": since, "$lte": until}},
+            {"_id": 0, key_field: 1, "category": 1, "viewers": 1, "created_at": 1}
+        ).sort("created_at", 1)
+        with mongo_timer("find", collection.name):
+            rows = list(cursor)
+        self.followed_until[kind] = until
+        if rows:
+            self.observe(kind, rows)
+
+    def leaderboard(self, kind, now=None):
+        """Séries classables, triées par croissance (catégories) ou par z-score (streams)."""
+        now = now or datetime.now()
+        states = self.states[kind]
+        for key in [key for key, state in states.items() if (now - state.seen_at).total_seconds() > PRUNE_SECONDS]:
+            del states[key]
+
+        candidates = [
+            (key, state) for key, state in states.items()
+            if state.count >= MIN_OBSERVATIONS
+            and state.last >= MIN_VIEWERS[kind]
+            and (now - state.seen_at).total_seconds() <= STALE_SECONDS
+        ]
+        if kind == "streams":
+            candidates = [(key, state) for key, state in candidates if state.zscore >= BREAKOUT_ZSCORE]
+            candidates.sort(key=lambda item: item[1].zscore, reverse=True)
+        else:
+            candidates = [(key, state) for key, state in candidates if state.growth > 0]
+            candidates.sort(key=lambda item: item[1].growth, reverse=True)
+
+        return [
+            {
+                KEY_FIELDS[kind]: key,
+                **({"category": state.category} if kind == "streams" else {}),
+                "viewers": state.last,
+                "baseline": round(state.mean),
+                "delta": state.delta,
+                "growth": round(state.growth, 4),
+                "zscore": round(state.zscore, 2)
+            }
+            for key, state in candidates[:self.leaderboard_size]
+        ]
+
+    def publish(self, kind):
+        self.collection.replace_one(
+            {"_id": kind},
+            {"items": self.leaderboard(kind), "tracked": len(self.states[kind]), "updated_at": datetime.now()},
+            upsert=True
+        )
@@ -0,0 +1,221 @@
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+
+from bson import ObjectId, json_util
+
+from metrics import (
+    WRITER_QUEUE_DEPTH, WRITER_SPOOLED_ROWS, WRITER_REPLAYED_ROWS, WRITER_DEAD_LETTER_ROWS, phase_timer
+)
+from mongodb import save_categories_to_db, save_streams_to_db, advance_data_generation, TRANSIENT_ERRORS
+
+# Configuration du logging
+logger = logging.getLogger("Writer")
+
+# Configuration de l'écriture différée
+WRITE_BATCH_SIZE = 500  # Lignes maximum par insertion
+SPOOL_DIR = os.environ.get("SCRAPER_SPOOL_DIR", os.path.join("data", "spool"))
+SPOOL_RETRY_SECONDS = 30  # Délai entre deux tentatives de rejeu du spool
+CYCLE_END = "cycle_end"  # Marqueur de fin de cycle dans la file d'écriture
+
+SAVERS = {
+    "categories": save_categories_to_db,
+    "streams": save_streams_to_db
+}
+
+class WriteBehindWriter:
+    """Écrit en arrière-plan les lignes du scraper dans MongoDB, par lots bornés.
+
+    Les lots qui ne peuvent pas être enregistrés faute de connexion (TRANSIENT_ERRORS)
+    sont ajoutés à un spool disque (un fichier NDJSON par type, en ajout seul) puis rejoués
+    dès que MongoDB répond. Chaque ligne reçoit son `_id` avant le spool : un rejeu
+    interrompu puis repris n'insère pas de doublons. Un lot refusé par la base (le saver
+    retourne None) ne réussira pas davantage plus tard : il part dans un fichier à part
+    (`<type>.dead.ndjson`) et l'écriture comme le rejeu continuent après lui.
+
+    La génération des données (invalidation des caches de l'API, diffusion en direct)
+    avance une seule fois par cycle, lorsque le marqueur de fin de cycle est atteint :
+    l'API ne voit jamais un cycle à moitié écrit. Le rejeu du spool ne la fait pas avancer.
+    En mode distribué, seul le coordinateur termine les cycles (`force`), une fois les
+    tâches de ses workers terminées.
+    """
+
+    def __init__(self, savers=SAVERS, spool_dir=SPOOL_DIR, batch_size=WRITE_BATCH_SIZE,
+                 retry_seconds=SPOOL_RETRY_SECONDS, on_saved=None, on_cycle_end=advance_data_generation):
+        self.savers = savers
+        self.on_saved = on_saved  # Appelé avec (type, lignes) après chaque lot enregistré
+        self.on_cycle_end = on_cycle_end  # Appelé à la fin d'un cycle dont des lignes ont été enregistrées
+        self._saved_in_cycle = False
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._healthy = True
+        self._last_replay = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, kind, rows):
+        """Met en file les lignes d'une catégorie ; ne bloque jamais sur la base."""
+        if not rows:
+            return
+        # La date de création reflète le moment du scraping, pas celui de l'écriture
+        created_at = datetime.now()
+        for row in rows:
+            row.setdefault("created_at", created_at)
+        self.start()
+        self._queue.put((kind, rows))
+        WRITER_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def end_cycle(self, force=False):
+        """Marque la fin d'un cycle, après les lignes déjà soumises.
+        
+        `force` fait avancer la génération même si ce writer n'a rien enregistré
+        (lignes écrites par les workers d'autres processus).
+        """
+        self.start()
+        self._queue.put((CYCLE_END, force))
+
+    def join(self):
+        """Attend que toutes les lignes en file soient écrites ou mises en spool."""
+        self._queue.join()
+
+    def close(self, timeout=60):
+        """Vide la file puis arrête le thread d'écriture."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.retry_seconds)
+            except queue.Empty:
+                self.replay_spool()
+                continue
+
+            try:
+                if item is None:
+                    return
+                kind, rows = item
+                if kind == CYCLE_END:
+                    self._end_cycle(force=rows)
+                else:
+                    self._write(kind, rows)
+                if time.monotonic() - self._last_replay >= self.retry_seconds:
+                    self.replay_spool()
+            except Exception as e:
+                logger.error(f"Erreur dans le thread d'écriture: {e}")
+            finally:
+                self._queue.task_done()
+                WRITER_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _write(self, kind, rows):
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            if not self._healthy:
+                # MongoDB indisponible : ne pas attendre le délai de connexion à chaque lot
+                self._spool(kind, batch)
+                continue
+
+            try:
+                with phase_timer("db_write"):
+                    result = self.savers[kind](batch)
+            except TRANSIENT_ERRORS as e:
+                logger.warning(f"MongoDB indisponible, écriture mise en spool: {e}")
+                self._healthy = False
+                self._spool(kind, batch)
+                continue
+            if result is None:
+                self._dead_letter(kind, batch)
+            else:
+                self._saved_in_cycle = True
+                if self.on_saved is not None:
+                    self.on_saved(kind, batch)
+
+    def _end_cycle(self, force=False):
+        if not (force or self._saved_in_cycle) or self.on_cycle_end is None:
+            return
+        try:
+            self.on_cycle_end()
+            self._saved_in_cycle = False
+        except Exception as e:
+            logger.error(f"Erreur lors de la fin de cycle d'écriture: {e}")
+
+    def _spool_path(self, kind):
+        return os.path.join(self.spool_dir, f"{kind}.ndjson")
+
+    def _dead_letter_path(self, kind):
+        return os.path.join(self.spool_dir, f"{kind}.dead.ndjson")
+
+    def _append(self, path, rows):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as spool:
+            for row in rows:
+                row.setdefault("_id", ObjectId())
+                spool.write(json_util.dumps(row) + "\n")
+
+    def _spool(self, kind, rows):
+        self._append(self._spool_path(kind), rows)
+        WRITER_SPOOLED_ROWS.labels(kind=kind).inc(len(rows))
+        logger.warning(f"{len(rows)} lignes ({kind}) mises en spool dans {self.spool_dir}")
+
+    def _dead_letter(self, kind, rows):
+        self._append(self._dead_letter_path(kind), rows)
+        WRITER_DEAD_LETTER_ROWS.labels(kind=kind).inc(len(rows))
+        logger.error(f"{len(rows)} lignes ({kind}) refusées, mises de côté dans {self._dead_letter_path(kind)}")
+
+    def replay_spool(self):
+        """Rejoue le spool dans MongoDB ; s'arrête dès que MongoDB est de nouveau indisponible."""
+        self._last_replay = time.monotonic()
+        for kind in self.savers:
+            path = self._spool_path(kind)
+            replaying = path + ".replay"
+            # Un rejeu interrompu est repris avant le spool courant
+            for source in (replaying, path):
+                if not os.path.exists(source):
+                    continue
+                if source == path:
+                    os.replace(path, replaying)
+                if not self._replay_file(kind, replaying):
+                    return
+                os.remove(replaying)
+        self._healthy = True
+
+    def _replay_file(self, kind, path):
+        batch = []
+        with open(path, encoding="utf-8") as spool:
+            for line in spool:
+                batch.append(json_util.loads(line))
+                if len(batch) >= self.batch_size:
+                    if not self._replay_batch(kind, batch):
+                        return False
+                    batch = []
+        return not batch or self._replay_batch(kind, batch)
+
+    def _replay_batch(self, kind, batch):
+        # Lignes anciennes : historique et agrégats uniquement, l'état courant est conservé
+        try:
+            result = self.savers[kind](batch, snapshot=False)
+        except TRANSIENT_ERRORS as e:
+            logger.warning(f"MongoDB indisponible, rejeu du spool interrompu: {e}")
+            self._healthy = False
+            return False
+        if result is None:
+            # Lot refusé : le rejeu continue avec les lots suivants
+            self._dead_letter(kind, batch)
+            return True
+        WRITER_REPLAYED_ROWS.labels(kind=kind).inc(len(batch))
+        logger.info(f"{len(batch)} lignes ({kind}) rejouées depuis le spool")
+        return True
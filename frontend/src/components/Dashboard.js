@@ -13,6 +13,34 @@ const mockCategories = [
   ];
 
 
+// Apply a live diff (changed rows + removed keys) to a list sorted by viewers
+const applyRowsDiff = (rows, diff, key) => {
+  if (!diff) return rows;
+  const removed = new Set(diff.removed);
+  const changed = new Map(diff.changed.map((row) => [row[key], row]));
+  const merged = rows
+    .filter((row) => !removed.has(row[key]))
+    .map((row) => (changed.has(row[key]) ? { ...row, ...changed.get(row[key]) } : row));
+  const existing = new Set(merged.map((row) => row[key]));
+  diff.changed.forEach((row) => {
+    if (!existing.has(row[key])) merged.push(row);
+  });
+  return merged.sort((a, b) => b.viewers - a.viewers).slice(0, Math.max(rows.length, 1));
+};
+
+// Replace or append the history points of the current hour
+const applyHistoryPoints = (history, points, key) => {
+  if (!points || points.length === 0) return history;
+  const pointId = (p) => `${p[key]}|${p.month}|${p.day}|${p.hour}`;
+  const updated = new Map(points.map((p) => [pointId(p), p]));
+  const merged = history.map((p) => updated.get(pointId(p)) || p);
+  const existing = new Set(history.map(pointId));
+  points.forEach((p) => {
+    if (!existing.has(pointId(p))) merged.push(p);
+  });
+  return merged;
+};
+
 // Main dashboard component
 const TwitchDashboard = () => {
   // States for storing data
@@ -43,20 +71,14 @@ const TwitchDashboard = () => {
         // Convert timeRange to hours for API
         const hours = timeRange === '24h' ? 24 : timeRange === '7d' ? 168 : 720;
         
-        // Fetch all data in parallel for better performance
-        const [
-          categoriesData, 
-          streamsData, 
-          historyData, 
-          streamsHistoryData,
-          statisticsData
-        ] = await Promise.all([
-          fetchWithTimeout(`${API_BASE_URL}/categories`),
-          fetchWithTimeout(`${API_BASE_URL}/streams`),
-          fetchWithTimeout(`${API_BASE_URL}/categories/history?hours=${hours}`),
-          fetchWithTimeout(`${API_BASE_URL}/streams/history?hours=${hours}`),
-          fetchWithTimeout(`${API_BASE_URL}/statistics`)
-        ]);
+        // Fetch all panels in one request, built from the same scrape cycle
+        const {
+          categories: categoriesData,
+          streams: streamsData,
+          categories_history: historyData,
+          streams_history: streamsHistoryData,
+          statistics: statisticsData
+        } = await fetchWithTimeout(`${API_BASE_URL}/dashboard?hours=${hours}`);
         
         // Update state with fetched data
         setCategories(categoriesData);
@@ -92,6 +114,27 @@ const TwitchDashboard = () => {
     fetchData();
   }, [timeRange]);
 
+  // Live updates pushed by the API after each scrape cycle
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return undefined;
+
+    const source = new EventSource(`${API_BASE_URL}/live`);
+    source.addEventListener('update', (event) => {
+      const diff = JSON.parse(event.data);
+      setCategories((current) => applyRowsDiff(current, diff.categories, 'category'));
+      setStreams((current) => applyRowsDiff(current, diff.streams, 'channel'));
+      if (diff.statistics) setStatistics(diff.statistics);
+
+      // The 30d view is built from daily points, hourly points do not apply
+      if (timeRange !== '30d') {
+        setCategoryHistory((current) => applyHistoryPoints(current, diff.categories_history, 'category'));
+        setStreamsHistory((current) => applyHistoryPoints(current, diff.streams_history, 'channel'));
+      }
+    });
+
+    return () => source.close();
+  }, [timeRange]);
+
   useEffect(() => {
     renderCategoryChart();
     renderTimeSeriesChart();
@@ -230,19 +273,13 @@ const TwitchDashboard = () => {
     // Force re-fetch by triggering useEffect
     const fetchTimeRange = timeRange === '24h' ? 24 : timeRange === '7d' ? 168 : 720;
     
-    Promise.all([
-      fetchWithTimeout(`${API_BASE_URL}/categories`),
-      fetchWithTimeout(`${API_BASE_URL}/streams`),
-      fetchWithTimeout(`${API_BASE_URL}/categories/history?hours=${fetchTimeRange}`),
-      fetchWithTimeout(`${API_BASE_URL}/streams/history?hours=${fetchTimeRange}`),
-      fetchWithTimeout(`${API_BASE_URL}/statistics`)
-    ])
-    .then(([categoriesData, streamsData, historyData, streamsHistoryData, statisticsData]) => {
-      setCategories(categoriesData);
-      setStreams(streamsData);
-      setCategoryHistory(historyData);
-      setStreamsHistory(streamsHistoryData);
-      setStatistics(statisticsData);
+    fetchWithTimeout(`${API_BASE_URL}/dashboard?hours=${fetchTimeRange}`)
+    .then((dashboard) => {
+      setCategories(dashboard.categories);
+      setStreams(dashboard.streams);
+      setCategoryHistory(dashboard.categories_history);
+      setStreamsHistory(dashboard.streams_history);
+      setStatistics(dashboard.statistics);
       setLoading(false);
     })
     .catch(err => {